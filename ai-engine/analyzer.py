@@ -1,10 +1,15 @@
-import spacy
+import os
+import re
 import textstat
 from collections import Counter
-import re
+from contextlib import nullcontext
+from functools import lru_cache
+from model_registry import get_model
+from qa_extractor import extract_qa_spans, QA_EXTRACTOR_VERSION
+from lexicon import LexiconMatcher, load_lexicon_files, merge_lexicons, lexicon_fingerprint, lexicon_signature
 
-# Load model once
-nlp = spacy.load("en_core_web_sm")
+# Bump whenever lexicons or scoring change so cached/stored analyses are recomputed
+ANALYZER_VERSION = "2"
 
 # --- Optimized Configuration (Combined from both branches) ---
 # Using sets for O(1) lookup speed
@@ -12,7 +17,7 @@ FILLER_WORDS = {"um", "uh", "like", "you know", "so", "actually", "basically"}
 TECH_WORDS = {
     "python", "java", "arduino", "iot", "machine learning",
     "database", "api", "react", "node", "algorithm", "data structure"
-]
+}
 
 ACTION_VERBS = ["built", "created", "developed", "implemented", "designed", "optimized"]
 WEAK_PHRASES = ["i think", "maybe", "probably", "sort of", "kind of"]
@@ -21,32 +26,120 @@ CONNECTORS = ["because", "therefore", "however", "so", "then", "while", "althoug
 STAR_WORDS = ["situation", "task", "action", "result","team"]
 HEDGES = ["maybe", "perhaps", "might", "could"]
 
-
-def analyze_text(text):
+# Built-in lexicons; LEXICON_DIR/<interview_type>/<category>.txt files extend them
+DEFAULT_LEXICONS = {
+    "filler": FILLER_WORDS,
+    "tech": TECH_WORDS,
+    "action_verb": ACTION_VERBS,
+    "weak_phrase": WEAK_PHRASES,
+    "connector": CONNECTORS,
+    "star": STAR_WORDS,
+    "hedge": HEDGES,
+}
+
+def get_lexicons(interview_type=None):
+    return merge_lexicons(DEFAULT_LEXICONS, load_lexicon_files(interview_type))
+
+# Compiled matchers and fingerprints are cached per interview type *and* lexicon file state
+# (mtimes/sizes), so an edited lexicon file is picked up without restarting the process.
+def get_lexicon_matcher(interview_type=None):
+    """Matching cost is independent of lexicon size."""
+    return _compile_matcher(interview_type, lexicon_signature(interview_type))
+
+@lru_cache(maxsize=32)
+def _compile_matcher(interview_type, signature):
+    return LexiconMatcher(get_model("spacy"), get_lexicons(interview_type))
+
+def lexicon_version(interview_type=None):
+    """Fingerprint of the effective lexicons, for cache keys."""
+    return _lexicon_version(interview_type, lexicon_signature(interview_type))
+
+@lru_cache(maxsize=32)
+def _lexicon_version(interview_type, signature):
+    return lexicon_fingerprint(get_lexicons(interview_type))
+
+# Terms the dashboard's "Technical Focus" chart counts across interviews
+DASHBOARD_KEYWORDS = [w.strip().lower() for w in os.getenv("DASHBOARD_KEYWORDS", "react,node,python,mongodb,api,database,java,oops").split(",") if w.strip()]
+
+def count_keywords(text, keywords=None):
+    """Whole-word, case-insensitive counts; stored on the report so listings never need the transcript."""
+    keywords = DASHBOARD_KEYWORDS if keywords is None else keywords
+    return {word: len(re.findall(rf"\b{re.escape(word)}\b", text or "", re.IGNORECASE)) for word in keywords}
+
+def scoring_version(interview_type=None, cached=True):
+    """
+    Everything derived from a stored transcript (`analysis`, `keyword_counts`): Q&A rules,
+    scoring, lexicons and the dashboard keywords.
+    cached=False fingerprints the lexicon files as they are on disk right now.
+    """
+    lexicons = lexicon_version(interview_type) if cached else lexicon_fingerprint(get_lexicons(interview_type))
+    keywords = lexicon_fingerprint({"dashboard": DASHBOARD_KEYWORDS})
+    return f"qa-{QA_EXTRACTOR_VERSION}|analyzer-{ANALYZER_VERSION}|lex-{lexicons}|kw-{keywords}"
+
+def analyze_text(text, interview_type=None):
     if not text.strip():
         return {"error": "Empty transcript"}
 
-    doc = nlp(text)
+    # Shared spaCy pipeline, loaded once per process on first use
+    return analyze_doc(get_model("spacy")(text), text, interview_type)
+
+def analyze_texts(texts, batch_size=64, n_process=1, interview_type=None):
+    """
+    Scores many independent texts through nlp.pipe (optionally multi-process)
+    and returns one analyze_text-style result per input, in order.
+    """
+    texts = list(texts)
+    results = [{"error": "Empty transcript"} if not t.strip() else None for t in texts]
+    pending = [i for i, r in enumerate(results) if r is None]
+
+    docs = get_model("spacy").pipe((texts[i] for i in pending), batch_size=batch_size, n_process=n_process)
+    for i, doc in zip(pending, docs):
+        results[i] = analyze_doc(doc, texts[i], interview_type)
+    return results
+
+def analyze_transcript(transcript, interview_type=None, timer=None):
+    """
+    Parses the transcript once, derives the Q&A spans from that Doc and scores every
+    answer span in place. Returns [{"question", "answer", "analysis"}, ...].
+    `timer(stage)` optionally returns a context manager timing "qa_extraction" and "text_analysis".
+    """
+    if not transcript or not transcript.strip():
+        return []
+
+    timer = timer or (lambda stage: nullcontext())
+    with timer("qa_extraction"):
+        doc = get_model("spacy")(transcript)
+        qa_spans = extract_qa_spans(doc)
+
+    qa_analysis = []
+    with timer("text_analysis"):
+        for qa in qa_spans:
+            analysis = analyze_doc(qa["answer_span"], qa["answer"], interview_type) if qa["answer"].strip() else {"error": "Empty transcript"}
+            qa_analysis.append({
+                "question": qa["question"],
+                "answer": qa["answer"],
+                "analysis": analysis
+            })
+    return qa_analysis
+
+def analyze_doc(doc, text=None, interview_type=None):
+    """Scores an already-parsed Doc or Span; `text` defaults to its own text."""
+    text = doc.text if text is None else text
     # Filter for actual words (alphabetic)
     tokens = [token for token in doc if token.is_alpha]
     words_lower = [t.text.lower() for t in tokens]
     total_words = len(words_lower)
     sentences = list(doc.sents)
 
-    # 1. Frequency Analysis (Helper for specific phrase detection)
-    def count_keywords(word_list):
-        count = 0
-        for word in word_list:
-            # \b ensures we don't match 'react' inside 'reaction'
-            pattern = rf"\b{re.escape(word)}\b"
-            count += len(re.findall(pattern, text.lower()))
-        return count
+    # 1. Frequency Analysis: every lexicon counted in one token-level pass.
+    # Token boundaries mean 'react' never matches inside 'reaction'.
+    hits = get_lexicon_matcher(interview_type).match(doc)
 
     # ---------------- Metrics ----------------
-    filler_count = sum(1 for w in words_lower if w in FILLER_WORDS)
-    tech_count = sum(1 for w in words_lower if w in TECH_WORDS)
-    action_verb_count = sum(1 for w in words_lower if w in ACTION_VERBS)
-    weak_phrase_count = count_keywords(WEAK_PHRASES)
+    filler_count = sum(hits["filler"].values())
+    tech_count = sum(hits["tech"].values())
+    action_verb_count = sum(hits["action_verb"].values())
+    weak_phrase_count = sum(hits["weak_phrase"].values())
     
     # Vocabulary Richness
     vocab_richness = len(set(words_lower)) / max(total_words, 1)
@@ -81,7 +174,7 @@ def analyze_text(text):
         suggestions.append("Use active verbs (e.g., 'I managed' instead of 'It was managed by me') to show ownership.")
 
     # STAR Method Check
-    star_hits = sum(1 for w in STAR_WORDS if w in text.lower())
+    star_hits = len(hits["star"])
     if star_hits < 2:
         problems.append("Structure: Answer may lack STAR format")
         suggestions.append("Explicitly mention the Situation, Task, Action, and Result in your stories.")
@@ -0,0 +1,43 @@
+import os
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from database import client, MONGO_MAX_POOL_SIZE
+
+# ⚡ Async data access for the API. pymongo is blocking, so `async def` routes hand every
+# database call to a dedicated thread pool and await it: the event loop keeps serving other
+# requests while one waits on Mongo. A separate pool (rather than Starlette's shared one)
+# keeps reads from queueing behind uploads and long-polling SSE change streams.
+MONGO_ASYNC_THREADS = int(os.getenv("MONGO_ASYNC_THREADS", str(min(MONGO_MAX_POOL_SIZE, 32))))
+# How long a route awaits one database call before answering 503 (seconds)
+MONGO_ASYNC_TIMEOUT = float(os.getenv("MONGO_ASYNC_TIMEOUT", "30"))
+
+# SSE streams block for up to EVENT_POLL_SECONDS per change-stream poll; they share their own
+# bounded pool, so many open dashboards slow each other down rather than every route
+SSE_STREAM_THREADS = int(os.getenv("SSE_STREAM_THREADS", "16"))
+
+_executor = ThreadPoolExecutor(max_workers=MONGO_ASYNC_THREADS, thread_name_prefix="mongo")
+_stream_executor = ThreadPoolExecutor(max_workers=SSE_STREAM_THREADS, thread_name_prefix="sse")
+
+class DatabaseTimeoutError(Exception):
+    """Raised when a database call doesn't finish within MONGO_ASYNC_TIMEOUT."""
+
+async def run_db(fn, *args, **kwargs):
+    """Runs a blocking data-access function (database.py, report_payloads, ...) off the event loop."""
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(_executor, functools.partial(fn, *args, **kwargs))
+    try:
+        return await asyncio.wait_for(future, MONGO_ASYNC_TIMEOUT)
+    except asyncio.TimeoutError:
+        # The thread finishes on its own; set MONGO_OPERATION_TIMEOUT_MS to bound it server-side too
+        raise DatabaseTimeoutError(f"{getattr(fn, '__name__', fn)} took longer than {MONGO_ASYNC_TIMEOUT}s")
+
+async def run_stream(fn, *args, **kwargs):
+    """Runs a blocking change-stream or event poll for an SSE response on the stream pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_stream_executor, functools.partial(fn, *args, **kwargs))
+
+def close_db():
+    _executor.shutdown(wait=False, cancel_futures=True)
+    _stream_executor.shutdown(wait=False, cancel_futures=True)
+    client.close()
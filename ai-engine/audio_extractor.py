@@ -1,6 +1,45 @@
 import os
+import shutil
+import subprocess
+import numpy as np
 from moviepy.editor import VideoFileClip
 
+# Whisper's native input: mono float32 PCM at 16 kHz
+WHISPER_SAMPLE_RATE = 16000
+
+def _ffmpeg_binary():
+    # moviepy ships ffmpeg through imageio-ffmpeg; prefer it over whatever is on PATH
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        return shutil.which("ffmpeg")
+
+def load_audio_array(video_path, sample_rate=WHISPER_SAMPLE_RATE):
+    """
+    Decodes the audio track straight into a float32 NumPy waveform via an ffmpeg pipe,
+    without writing a .wav. Returns None when in-memory decoding is unavailable.
+    """
+    ffmpeg = _ffmpeg_binary()
+    if not ffmpeg:
+        return None
+
+    cmd = [
+        # Errors only on stderr: progress stats would otherwise pile up in the captured buffer
+        ffmpeg, "-nostdin", "-hide_banner", "-loglevel", "error", "-nostats", "-threads", "0", "-i", video_path,
+        "-vn", "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(sample_rate), "-"
+    ]
+    try:
+        out = subprocess.run(cmd, capture_output=True, check=True).stdout
+    except OSError as e:
+        print(f"⚠️ In-memory audio decode failed, falling back to WAV: {e}")
+        return None
+    except subprocess.CalledProcessError as e:
+        print(f"⚠️ In-memory audio decode failed, falling back to WAV: {e.stderr.decode(errors='replace')[-500:].strip()}")
+        return None
+
+    return np.frombuffer(out, np.int16).astype(np.float32) / 32768.0
+
 def extract_audio_from_video(video_path):
     # 🔥 FIX: Create a unique name based on the video path 
     # This prevents User A from overwriting User B's audio
@@ -0,0 +1 @@
+"""Pipeline benchmarks: see benchmarks/run.py."""
@@ -0,0 +1,153 @@
+import os
+import wave
+import random
+import subprocess
+import cv2
+import numpy as np
+from audio_extractor import WHISPER_SAMPLE_RATE, _ffmpeg_binary
+from emotion_summary import ALL_EMOTIONS
+
+# Generated fixtures are cached here, keyed by their parameters
+FIXTURE_DIR = os.getenv("BENCH_FIXTURE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".fixtures"))
+
+QUESTIONS = [
+    "Tell me about a project you are proud of.",
+    "How did you handle a disagreement in your team?",
+    "What would you optimize first in a slow API?",
+    "Describe a time you had to learn something quickly.",
+    "Why do you want to work on this product?",
+    "Can you walk me through how you designed the database?",
+]
+ANSWER_WORDS = [
+    "i", "we", "the", "a", "project", "users", "data", "then", "because", "however",
+    "built", "created", "developed", "implemented", "designed", "optimized",
+    "react", "node", "python", "mongodb", "api", "docker", "aws", "algorithm",
+    "situation", "task", "action", "result", "team", "um", "uh", "like", "you know",
+    "basically", "i think", "maybe", "probably", "sort of", "latency", "cache", "queue",
+]
+
+def _path(name):
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    return os.path.join(FIXTURE_DIR, name)
+
+def _draw_face(frame, t, width, height):
+    """A cartoon face that drifts and cycles smile / neutral / frown every few seconds."""
+    cx = int(width / 2 + width * 0.05 * np.sin(t / 3))
+    cy = int(height / 2 + height * 0.03 * np.cos(t / 4))
+    rx, ry = int(width * 0.16), int(height * 0.28)
+    cv2.ellipse(frame, (cx, cy), (rx, ry), 0, 0, 360, (150, 180, 230), -1)
+    for dx in (-rx // 2.5, rx // 2.5):
+        cv2.circle(frame, (int(cx + dx), cy - ry // 4), max(rx // 8, 2), (40, 40, 40), -1)
+
+    mood = int(t // 4) % 3
+    mouth = (cx, cy + ry // 2)
+    axes = (rx // 2, max(ry // 8, 2))
+    if mood == 0:
+        cv2.ellipse(frame, mouth, axes, 0, 0, 180, (60, 60, 160), 3)       # Smile
+    elif mood == 1:
+        cv2.line(frame, (cx - rx // 2, mouth[1]), (cx + rx // 2, mouth[1]), (60, 60, 160), 3)
+    else:
+        cv2.ellipse(frame, mouth, axes, 0, 180, 360, (60, 60, 160), 3)     # Frown
+
+def _speech_like_audio(seconds, seed=0):
+    """Harmonic 'syllables' in ~3 s phrases separated by pauses, so silence splitting has cuts."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * WHISPER_SAMPLE_RATE)) / WHISPER_SAMPLE_RATE
+    pitch = 120 + 40 * np.sin(2 * np.pi * 0.3 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / WHISPER_SAMPLE_RATE
+    voice = sum(np.sin(k * phase) / k for k in range(1, 5))
+    syllables = 0.5 + 0.5 * np.sin(2 * np.pi * 4 * t)
+    speaking = (t % 4) < 3
+    noise = rng.normal(0, 0.005, len(t))
+    return (0.3 * voice * syllables * speaking + noise).astype(np.float32)
+
+def _write_wav(path, waveform):
+    with wave.open(path, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(WHISPER_SAMPLE_RATE)
+        wav.writeframes((np.clip(waveform, -1, 1) * 32767).astype(np.int16).tobytes())
+
+def make_video(seconds=60, width=640, height=480, fps=25, with_audio=True, codec="mp4v"):
+    """
+    Synthetic interview video (drawn face + speech-like audio track). Returns its path.
+    codec="h264" re-encodes it like a phone/browser recording (B-frames, 10 s keyframe
+    interval, stream starting at a non-zero timestamp); None when ffmpeg is missing.
+    """
+    name = f"interview_{seconds}s_{width}x{height}_{fps}fps{'_av' if with_audio else ''}.mp4"
+    if codec == "h264":
+        return _reencode_h264(make_video(seconds, width, height, fps, with_audio), fps)
+    path = _path(name)
+    if os.path.exists(path):
+        return path
+
+    silent_path = _path(f"video_only_{name}")
+    writer = cv2.VideoWriter(silent_path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    for i in range(int(seconds * fps)):
+        frame = np.full((height, width, 3), (70, 60, 50), dtype=np.uint8)
+        _draw_face(frame, i / fps, width, height)
+        writer.write(frame)
+    writer.release()
+
+    ffmpeg = _ffmpeg_binary()
+    if not with_audio or not ffmpeg:
+        if with_audio:
+            print("⚠️ ffmpeg not found: fixture has no audio track")
+        os.replace(silent_path, path)
+        return path
+
+    wav_path = _path(f"audio_{seconds}s.wav")
+    _write_wav(wav_path, _speech_like_audio(seconds))
+    subprocess.run(
+        [ffmpeg, "-nostdin", "-y", "-loglevel", "error", "-i", silent_path, "-i", wav_path,
+         "-c:v", "copy", "-c:a", "aac", "-shortest", path],
+        check=True
+    )
+    os.remove(silent_path)
+    os.remove(wav_path)
+    return path
+
+def _reencode_h264(source, fps):
+    path = _path(f"h264_{os.path.basename(source)}")
+    if os.path.exists(path):
+        return path
+    ffmpeg = _ffmpeg_binary()
+    if not ffmpeg:
+        return None
+    subprocess.run(
+        [ffmpeg, "-nostdin", "-y", "-loglevel", "error", "-i", source, "-c:v", "libx264",
+         "-g", str(fps * 10), "-bf", "3", "-c:a", "copy", "-output_ts_offset", "0.5", path],
+        check=True
+    )
+    return path
+
+def make_transcript(minutes=30, seed=0, words_per_second=2.5):
+    """Long Q&A transcript as (full_text, timestamped segments)."""
+    rng = random.Random(seed)
+    segments = []
+    clock = 0.0
+    while clock < minutes * 60:
+        sentences = [rng.choice(QUESTIONS)]
+        for _ in range(rng.randint(3, 8)):
+            words = [rng.choice(ANSWER_WORDS) for _ in range(rng.randint(8, 20))]
+            sentences.append(" ".join(words).capitalize() + ".")
+        for sentence in sentences:
+            length = len(sentence.split()) / words_per_second
+            segments.append({"start": round(clock, 2), "end": round(clock + length, 2), "text": sentence})
+            clock += length + 0.3
+    return " ".join(seg["text"] for seg in segments), segments
+
+def make_emotion_labels(seconds=3600, seed=0):
+    """Per-second labels with realistic runs and occasional no-face seconds."""
+    rng = random.Random(seed)
+    labels = []
+    current = "neutral"
+    for _ in range(seconds):
+        roll = rng.random()
+        if roll < 0.05:
+            labels.append("unknown")
+            continue
+        if roll < 0.2:
+            current = rng.choice(ALL_EMOTIONS)
+        labels.append(current)
+    return labels
@@ -0,0 +1,179 @@
+"""
+⏱️ Per-stage pipeline benchmarks on synthetic fixtures.
+
+Run from the ai-engine directory:
+
+    python -m benchmarks.run                        # all stages, compare with baselines.json
+    python -m benchmarks.run --stages fer,analyze_text --repeat 5
+    python -m benchmarks.run --save-baseline        # record this machine's numbers
+
+Stages whose model, binary or service isn't available are reported as skipped.
+Exits with status 1 when a stage's correctness check fails, or when a stage is slower
+(or uses more memory) than its baseline by more than --threshold.
+"""
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import statistics
+import tracemalloc
+from benchmarks.stages import STAGES, Fixtures, SkipStage, CheckFailed
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+DEFAULT_THRESHOLD = float(os.getenv("BENCH_REGRESSION_THRESHOLD", "0.25"))
+# Tiny stages are noisy; don't flag differences below this many seconds
+MIN_SECONDS_DELTA = 0.005
+
+def _rss_peak_mb():
+    try:
+        import resource
+        # ru_maxrss is in KB on Linux, bytes on macOS
+        scale = 1 if sys.platform == "darwin" else 1024
+        return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2**20, 1)
+    except ImportError:
+        return None
+
+def measure(run, repeat):
+    """Median wall time over `repeat` runs (after one warm-up), plus traced peak memory."""
+    run()
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        items = run()
+        times.append(time.perf_counter() - started)
+
+    # Separate run for memory: tracemalloc slows pure-Python code down too much to time under it
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    seconds = statistics.median(times)
+    return {
+        "seconds": round(seconds, 4),
+        "items": round(items, 1),
+        "throughput": round(items / seconds, 1) if seconds > 0 else None,
+        "peak_mb": round(peak / 2**20, 2),
+        "rss_peak_mb": _rss_peak_mb()
+    }
+
+def run_benchmarks(names, fx, repeat):
+    results = {}
+    for name in names:
+        try:
+            run, unit = STAGES[name](fx)
+        except (SkipStage, ImportError) as e:
+            print(f"⏭️  {name}: skipped ({e})")
+            results[name] = {"skipped": str(e)}
+            continue
+        except CheckFailed as e:
+            print(f"❌ {name}: check failed ({e})")
+            results[name] = {"failed": str(e)}
+            continue
+
+        result = measure(run, repeat)
+        result["unit"] = unit
+        results[name] = result
+        print(f"✅ {name}: {result['seconds']}s, {result['throughput']} {unit}/s, peak {result['peak_mb']} MB")
+    return results
+
+def load_baselines(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def save_baselines(path, baselines, signature, results):
+    entry = baselines.setdefault(signature, {"stages": {}})
+    entry["machine"] = f"{platform.system()} {platform.machine()} / Python {platform.python_version()}"
+    for name, result in results.items():
+        if "skipped" not in result and "failed" not in result:
+            entry["stages"][name] = {k: result[k] for k in ("seconds", "peak_mb", "unit", "throughput")}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(baselines, f, indent=2, sort_keys=True)
+        f.write("\n")
+    print(f"💾 Baselines saved to {path} ({signature})")
+
+def compare(results, baseline, threshold):
+    """Returns a list of regression messages (empty when everything is within threshold)."""
+    regressions = []
+    for name, result in results.items():
+        base = (baseline or {}).get(name)
+        if "skipped" in result or "failed" in result or not base:
+            continue
+        slower = result["seconds"] - base["seconds"]
+        if result["seconds"] > base["seconds"] * (1 + threshold) and slower > MIN_SECONDS_DELTA:
+            regressions.append(f"{name}: {result['seconds']}s vs baseline {base['seconds']}s")
+        if result["peak_mb"] > base["peak_mb"] * (1 + threshold) and result["peak_mb"] - base["peak_mb"] > 1:
+            regressions.append(f"{name}: peak {result['peak_mb']} MB vs baseline {base['peak_mb']} MB")
+    return regressions
+
+def print_table(results, baseline):
+    print(f"\n{'stage':<20}{'seconds':>10}{'baseline':>10}{'change':>9}{'throughput':>18}{'peak MB':>10}")
+    for name, result in results.items():
+        if "skipped" in result:
+            print(f"{name:<20}{'skipped':>10}")
+            continue
+        if "failed" in result:
+            print(f"{name:<20}{'FAILED':>10}")
+            continue
+        base = (baseline or {}).get(name, {}).get("seconds")
+        change = f"{(result['seconds'] / base - 1) * 100:+.0f}%" if base else "-"
+        throughput = f"{result['throughput']} {result['unit']}/s"
+        print(f"{name:<20}{result['seconds']:>10}{base or '-':>10}{change:>9}{throughput:>18}{result['peak_mb']:>10}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-stage pipeline benchmarks")
+    parser.add_argument("--stages", default=",".join(STAGES), help="Comma-separated stage names")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--video-seconds", type=int, default=60)
+    parser.add_argument("--resolution", default="640x480")
+    parser.add_argument("--transcript-minutes", type=int, default=30)
+    parser.add_argument("--emotion-seconds", type=int, default=3600)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Allowed slowdown/memory growth as a fraction (0.25 = 25%%)")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    names = [n.strip() for n in args.stages.split(",") if n.strip()]
+    unknown = [n for n in names if n not in STAGES]
+    if unknown:
+        parser.error(f"Unknown stage(s): {', '.join(unknown)} (choose from {', '.join(STAGES)})")
+
+    width, height = (int(v) for v in args.resolution.lower().split("x"))
+    fx = Fixtures(args.video_seconds, width, height, args.transcript_minutes, args.emotion_seconds)
+    print(f"🏁 Benchmarking {len(names)} stage(s) on fixture {fx.signature}")
+
+    results = run_benchmarks(names, fx, args.repeat)
+    baselines = load_baselines(args.baseline)
+    baseline = baselines.get(fx.signature, {}).get("stages")
+    print_table(results, baseline)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"fixture": fx.params, "results": results}, f, indent=2)
+
+    failed = [name for name, result in results.items() if "failed" in result]
+    if failed:
+        print(f"\n❌ Check failed: {', '.join(failed)}")
+        return 1
+
+    if args.save_baseline:
+        save_baselines(args.baseline, baselines, fx.signature, results)
+        return 0
+
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n❌ {len(regressions)} regression(s) over {args.threshold:.0%}:")
+        for message in regressions:
+            print(f"   {message}")
+        return 1
+    print("\n✅ No regressions" if baseline else "\nℹ️ No baseline for this fixture yet (use --save-baseline)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,386 @@
+import os
+from benchmarks import fixtures
+
+# Each stage's setup loads models and builds inputs (untimed) and returns
+# (run, unit): `run()` does the timed work and returns how many `unit`s it processed.
+
+class SkipStage(Exception):
+    """The stage can't run in this environment (missing model, service or binary)."""
+
+class CheckFailed(Exception):
+    """The stage ran but produced wrong results; reported as a failure, not a timing."""
+
+class Fixtures:
+    """Lazily generated inputs shared by all stages of one benchmark run."""
+
+    def __init__(self, video_seconds=60, width=640, height=480, transcript_minutes=30, emotion_seconds=3600):
+        self.params = {
+            "video_seconds": video_seconds, "width": width, "height": height,
+            "transcript_minutes": transcript_minutes, "emotion_seconds": emotion_seconds
+        }
+        self._cache = {}
+
+    @property
+    def signature(self):
+        p = self.params
+        return f"{p['video_seconds']}s-{p['width']}x{p['height']}-{p['transcript_minutes']}min-{p['emotion_seconds']}labels"
+
+    def _get(self, key, build):
+        if key not in self._cache:
+            self._cache[key] = build()
+        return self._cache[key]
+
+    @property
+    def video(self):
+        p = self.params
+        return self._get("video", lambda: fixtures.make_video(p["video_seconds"], p["width"], p["height"]))
+
+    @property
+    def transcript(self):
+        return self._get("transcript", lambda: fixtures.make_transcript(self.params["transcript_minutes"]))
+
+    @property
+    def labels(self):
+        return self._get("labels", lambda: fixtures.make_emotion_labels(self.params["emotion_seconds"]))
+
+    @property
+    def frames(self):
+        from frame_extractor import iter_sampled_frames
+        return self._get("frames", lambda: list(iter_sampled_frames(self.video)))
+
+    @property
+    def waveform(self):
+        from audio_extractor import load_audio_array
+        waveform = self._get("waveform", lambda: load_audio_array(self.video))
+        if waveform is None or len(waveform) == 0:
+            raise SkipStage("no audio decoder (ffmpeg) or no audio track")
+        return waveform
+
+def _load_model(name):
+    from model_registry import get_model
+    try:
+        return get_model(name)
+    except (ImportError, OSError) as e:
+        raise SkipStage(f"{name} model unavailable: {e}")
+
+def _words(text):
+    return len(text.split())
+
+def frame_extraction(fx):
+    from frame_extractor import iter_sampled_frames
+    video = fx.video
+    return (lambda: sum(1 for _ in iter_sampled_frames(video))), "frames"
+
+def frame_shards(fx):
+    """
+    Decodes the timeline the way analyze_emotions_parallel shards it and checks the samples
+    are exactly the serial ones (same timestamps, same pixels), also on an H.264 re-encode
+    whose shard starts fall between keyframes.
+    """
+    import numpy as np
+    from frame_extractor import iter_sampled_frames, get_video_info
+    from emotion_analyzer import _plan_shards
+    workers = 4
+
+    def sharded(video):
+        fps, frame_count = get_video_info(video)
+        for start, end in _plan_shards(frame_count, max(int(fps), 1), workers):
+            yield from iter_sampled_frames(video, start_frame=start, end_frame=end)
+
+    p = fx.params
+    videos = [fx.video, fixtures.make_video(p["video_seconds"], p["width"], p["height"], codec="h264")]
+    for video in filter(None, videos):
+        serial = list(iter_sampled_frames(video))
+        shards = list(sharded(video))
+        if len(shards) != len(serial):
+            raise CheckFailed(f"{os.path.basename(video)}: {len(shards)} sharded samples vs {len(serial)} serial")
+        for (t, frame), (shard_t, shard_frame) in zip(serial, shards):
+            if t != shard_t or not np.array_equal(frame, shard_frame):
+                raise CheckFailed(f"{os.path.basename(video)}: sample at {t}s differs (sharded one at {shard_t}s)")
+
+    video = fx.video
+    return (lambda: sum(1 for _ in sharded(video))), "frames"
+
+def media_ingest(fx):
+    from media_ingest import open_media
+    video = fx.video
+    probe = open_media(video)
+    if probe is None:
+        raise SkipStage("PyAV not installed or MEDIA_SINGLE_DEMUX disabled")
+    probe.close()
+
+    def run():
+        import threading
+        media = open_media(video)
+        audio = threading.Thread(target=media.audio)
+        audio.start()
+        count = sum(1 for _ in media.frames())
+        audio.join()
+        media.close()
+        return count
+    return run, "frames"
+
+def ingest_slow_frames(fx):
+    """
+    The shared demux with a frame consumer slower than decoding, like FER on a CPU:
+    audio() must come back at demux speed instead of waiting for the frames to be
+    consumed, while the compressed video held in memory stays under a 1 MB bound (the
+    rest spills to disk). Runs on its own 5-minute low-resolution video, so there are
+    more samples than any decoded-frame buffer holds. Times audio() alone.
+    """
+    import time
+    import threading
+    import media_ingest
+    from media_ingest import open_media
+    from audio_extractor import WHISPER_SAMPLE_RATE
+    seconds = 300
+    buffer_mb = 1
+    video = fixtures.make_video(seconds, 320, 240)
+    delay = float(os.getenv("BENCH_SLOW_FRAME_SECONDS", "0.2"))
+    probe = open_media(video)
+    if probe is None:
+        raise SkipStage("PyAV not installed or MEDIA_SINGLE_DEMUX disabled")
+    has_audio = probe.audio_stream is not None
+    probe.close()
+    if not has_audio:
+        raise SkipStage("fixture has no audio track")
+
+    def run(check=False):
+        configured, media_ingest.MEDIA_PACKET_BUFFER_MB = media_ingest.MEDIA_PACKET_BUFFER_MB, buffer_mb
+        media = open_media(video)
+        stop = threading.Event()
+
+        def consume():
+            for _ in media.frames():
+                if stop.wait(delay):
+                    break
+        consumer = threading.Thread(target=consume)
+        consumer.start()
+        started = time.perf_counter()
+        try:
+            waveform = media.audio()
+            waited = time.perf_counter() - started
+            # Everything is demuxed by now, so this is the most that was ever held in memory
+            buffered = media._buffered_bytes
+        finally:
+            stop.set()
+            consumer.join()
+            media.close()
+            media_ingest.MEDIA_PACKET_BUFFER_MB = configured
+
+        if check:
+            consumer_seconds = seconds * delay
+            if waited > consumer_seconds / 2:
+                raise CheckFailed(f"audio() took {waited:.2f}s: it waited on the frame consumer (~{consumer_seconds:.0f}s)")
+            if buffered > buffer_mb * 2**20:
+                raise CheckFailed(f"{buffered / 2**20:.1f} MB of packets held in memory (bound {buffer_mb} MB)")
+        return len(waveform) / WHISPER_SAMPLE_RATE
+
+    run(check=True)
+    return run, "audio s"
+
+def fer(fx):
+    from emotion_analyzer import analyze_emotions_from_stream
+    _load_model("fer")
+    frames = fx.frames
+    return (lambda: len(analyze_emotions_from_stream(iter(frames)))), "frames"
+
+def face_crops(fx):
+    """
+    The batched path's face crop (emotion_analyzer._prepare_face) must be exactly what
+    FER.detect_emotions feeds its classifier, checked on boxes that cross every frame
+    edge as well as interior ones. Times the crops.
+    """
+    import random
+    import numpy as np
+    from emotion_analyzer import _prepare_face
+    detector = _load_model("fer")
+    frames = [img for _, img in fx.frames]
+    rng = random.Random(0)
+    cases = []
+    for _ in range(2000):
+        img = rng.choice(frames)
+        height, width = img.shape[:2]
+        w, h = rng.randint(5, width // 3), rng.randint(5, height // 3)
+        cases.append((img, [rng.randint(-w, width), rng.randint(-h, height), w, h]))
+
+    captured = []
+    classify = detector._classify_emotions
+    detector._classify_emotions = lambda faces: captured.append(faces) or np.zeros((len(faces), 7))
+    try:
+        for img, box in cases:
+            captured.clear()
+            detector.detect_emotions(img, face_rectangles=[box])
+            expected = captured[0][0] if captured else None
+            crop = _prepare_face(detector, img, box)
+            if (expected is None) != (crop is None) or (crop is not None and not np.array_equal(expected, crop[..., 0])):
+                raise CheckFailed(f"crop for box {box} on a {img.shape[1]}x{img.shape[0]} frame differs from FER's")
+    finally:
+        detector._classify_emotions = classify
+
+    def run():
+        for img, box in cases:
+            _prepare_face(detector, img, box)
+        return len(cases)
+    return run, "crops"
+
+def audio_extraction(fx):
+    from audio_extractor import load_audio_array
+    from audio_extractor import WHISPER_SAMPLE_RATE
+    video = fx.video
+    fx.waveform  # Skips when there's nothing to decode
+
+    def run():
+        return len(load_audio_array(video)) / WHISPER_SAMPLE_RATE
+    return run, "audio s"
+
+def transcription(fx):
+    from speech_to_text import transcribe_audio
+    from audio_extractor import WHISPER_SAMPLE_RATE
+    _load_model("whisper")
+    waveform = fx.waveform
+
+    def run():
+        transcribe_audio(waveform)
+        return len(waveform) / WHISPER_SAMPLE_RATE
+    return run, "audio s"
+
+def qa_extraction(fx):
+    from qa_extractor import extract_qa_pairs
+    _load_model("spacy")
+    text, _ = fx.transcript
+
+    def run():
+        extract_qa_pairs(text)
+        return _words(text)
+    return run, "words"
+
+def analyze_text(fx):
+    from analyzer import analyze_text as analyze
+    from qa_extractor import extract_qa_pairs
+    _load_model("spacy")
+    answers = [qa["answer"] for qa in extract_qa_pairs(fx.transcript[0])]
+    total_words = sum(_words(a) for a in answers)
+
+    def run():
+        for answer in answers:
+            analyze(answer)
+        return total_words
+    return run, "words"
+
+def analyze_transcript(fx):
+    from analyzer import analyze_transcript as analyze
+    _load_model("spacy")
+    text, _ = fx.transcript
+
+    def run():
+        analyze(text)
+        return _words(text)
+    return run, "words"
+
+def summarize_emotions(fx):
+    from emotion_summary import summarize_emotions as summarize
+    labels = fx.labels
+
+    def run():
+        summarize(labels, fps=1)
+        return len(labels)
+    return run, "labels"
+
+def mongo_writes(fx):
+    """
+    Writes one full report through the production write path: save_interview, then
+    offload_stage_output + save_stage_output per stage (as video_processor._save_stage
+    does), then the final update_interview. The modules' collections point at the bench
+    database while it runs, with the application's indexes.
+    """
+    from pymongo import MongoClient
+    from pymongo.errors import PyMongoError
+    import database
+    import report_payloads
+    from emotion_summary import summarize_emotions as summarize
+
+    url = os.getenv("BENCH_MONGO_URL") or os.getenv("MONGO_URL")
+    if url:
+        client = MongoClient(url, serverSelectionTimeoutMS=2000)
+        try:
+            client.admin.command("ping")
+        except PyMongoError as e:
+            raise SkipStage(f"MongoDB unreachable: {e}")
+    else:
+        try:
+            import mongomock
+        except ImportError:
+            raise SkipStage("set BENCH_MONGO_URL/MONGO_URL or install mongomock")
+        client = mongomock.MongoClient()
+
+    # Never the application database
+    db = client[os.getenv("BENCH_MONGO_DB", "interview_analyzer_bench")]
+    targets = {
+        (database, "reports_collection"): db["reports"],
+        (report_payloads, "reports_collection"): db["reports"],
+        (report_payloads, "payloads_collection"): db["report_payloads"],
+    }
+
+    def use_bench_db():
+        originals = {key: getattr(*key) for key in targets}
+        for (module, name), collection in targets.items():
+            setattr(module, name, collection)
+        return originals
+
+    def restore(originals):
+        for (module, name), collection in originals.items():
+            setattr(module, name, collection)
+
+    text, segments = fx.transcript
+    # Shaped like the Q&A stage output: one scored entry per question
+    analysis = [
+        {"question": seg["text"], "answer": text[i * 400:(i + 1) * 400], "start": seg["start"],
+         "scores": {"relevance": 0.7, "clarity": 0.6, "confidence": 0.8}, "keywords": ["api", "cache"]}
+        for i, seg in enumerate(segments[::6])
+    ]
+    labels = fx.labels
+    stages = [
+        ("transcription", {"transcript": segments}),
+        ("qa_analysis", {"analysis": analysis, "keyword_counts": {"api": 3, "cache": 2}, "analyzer_version": "bench"}),
+        ("emotions", {"raw_emotions": labels, "emotions": summarize(labels, fps=1), "emotion_summary_version": "bench"}),
+    ]
+
+    originals = use_bench_db()
+    try:
+        database.ensure_interview_indexes()
+        report_payloads.ensure_payload_indexes()
+    finally:
+        restore(originals)
+
+    def run():
+        originals = use_bench_db()
+        try:
+            database.reports_collection.delete_many({})
+            report_payloads.payloads_collection.delete_many({})
+            database.save_interview("bench.mp4", {"status": "Queued..."}, interview_id="bench")
+            for stage, data in stages:
+                fields, unset = report_payloads.offload_stage_output("bench", data)
+                database.save_stage_output("bench", stage, fields, unset)
+            database.update_interview("bench", {"duration": "60:00", "status": "Completed"})
+        finally:
+            restore(originals)
+        return 1
+    return run, "reports"
+
+# Pipeline order
+STAGES = {
+    "frame_extraction": frame_extraction,
+    "frame_shards": frame_shards,
+    "media_ingest": media_ingest,
+    "ingest_slow_frames": ingest_slow_frames,
+    "fer": fer,
+    "face_crops": face_crops,
+    "audio_extraction": audio_extraction,
+    "transcription": transcription,
+    "qa_extraction": qa_extraction,
+    "analyze_text": analyze_text,
+    "analyze_transcript": analyze_transcript,
+    "summarize_emotions": summarize_emotions,
+    "mongo_writes": mongo_writes,
+}
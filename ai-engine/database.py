@@ -1,18 +1,75 @@
 import os
+import re
+import json
 import uuid
+import base64
 from datetime import datetime, timezone
+from bson import ObjectId
 from pymongo import MongoClient, DESCENDING
+from pymongo.errors import PyMongoError
 from dotenv import load_dotenv
 
 load_dotenv()
 
 # Setup Connection
 MONGO_URL = os.getenv("MONGO_URL")
-client = MongoClient(MONGO_URL)
+# Connection pool and timeouts (milliseconds); unset timeouts keep the driver defaults
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_TIMEOUTS = {
+    option: int(os.getenv(env))
+    for option, env in {
+        "connectTimeoutMS": "MONGO_CONNECT_TIMEOUT_MS",
+        "serverSelectionTimeoutMS": "MONGO_SERVER_SELECTION_TIMEOUT_MS",
+        "socketTimeoutMS": "MONGO_SOCKET_TIMEOUT_MS",
+        "waitQueueTimeoutMS": "MONGO_WAIT_QUEUE_TIMEOUT_MS",
+        "timeoutMS": "MONGO_OPERATION_TIMEOUT_MS",
+    }.items()
+    if os.getenv(env)
+}
+# connect=False: no sockets or monitor threads until the first operation, so importing
+# this module (the API, spawned workers, rescore pool processes) is cheap
+client = MongoClient(
+    MONGO_URL,
+    maxPoolSize=MONGO_MAX_POOL_SIZE,
+    minPoolSize=MONGO_MIN_POOL_SIZE,
+    connect=False,
+    **MONGO_TIMEOUTS
+)
 db = client["interview_analyzer"]
 reports_collection = db["reports"]
 
-def save_interview(video_path: str, report: dict, title: str = "Untitled Interview", interview_type: str = "Technical", interview_id: str = None):
+# Listing view: everything the dashboard cards need, none of the bulky payloads
+SUMMARY_PROJECTION = {
+    "interview_id": 1,
+    "title": 1,
+    "interview_type": 1,
+    "video_path": 1,
+    "is_pinned": 1,
+    "notes": 1,
+    "status": 1,
+    "duration": 1,
+    "created_at": 1,
+    "analysis": {"$slice": 1},  # First answer holds the headline scores
+    "keyword_counts": 1,
+    "emotions.dominant_emotion": 1,
+    "emotions.confidence_score": 1,
+    "emotions.emotional_stability": 1
+}
+LISTING_SORT = [("is_pinned", DESCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "100"))
+
+def ensure_interview_indexes():
+    """Creates the lookup and listing indexes; safe to call on every startup."""
+    try:
+        reports_collection.create_index("interview_id", unique=True)
+        reports_collection.create_index(LISTING_SORT)
+        reports_collection.create_index([("interview_type", 1)] + LISTING_SORT)
+        reports_collection.create_index([("status", 1)] + LISTING_SORT)
+    except PyMongoError as e:
+        print(f"❌ Index Creation Error: {e}")
+
+def save_interview(video_path: str, report: dict, title: str = "Untitled Interview", interview_type: str = "Technical", interview_id: str = None, content_hash: str = None, size_bytes: int = None):
     """Saves a new analysis report with user-provided metadata and management fields."""
     if report is None:
         print("❌ Cannot save: Report is None")
@@ -26,6 +83,8 @@ def save_interview(video_path: str, report: dict, title: str = "Untitled Intervi
         "title": title,
         "interview_type": interview_type,
         "video_path": video_path,
+        "content_hash": content_hash,  # 🔥 SHA-256 of the upload, computed while copying it to disk
+        "size_bytes": size_bytes,
         "is_pinned": False,
         "status": report.get("status", "Completed"), # 🔥 Set initial status
         "duration": report.get("duration", "0:00"),    # 🔥 Set initial duration
@@ -73,6 +132,44 @@ def update_interview(interview_id: str, data: dict):
         print(f"❌ Update Error: {e}")
         return False
 
+def get_interview(interview_id: str, projection: dict = None):
+    """Single report by its UUID, or None."""
+    return reports_collection.find_one({"interview_id": interview_id}, projection)
+
+def mark_stage(interview_id: str, stage: str, status: str, error: str = None):
+    """Records one pipeline stage's state in the per-stage `stages` map."""
+    update_data = {
+        f"stages.{stage}.status": status,
+        f"stages.{stage}.updated_at": datetime.now(timezone.utc)
+    }
+    if error:
+        update_data[f"stages.{stage}.error"] = error
+    try:
+        reports_collection.update_one({"interview_id": interview_id}, {"$set": update_data})
+    except Exception as e:
+        print(f"❌ Stage Update Error: {e}")
+
+def save_stage_output(interview_id: str, stage: str, data: dict, unset: dict = None):
+    """
+    🔥 Persists a finished stage's output right away and marks the stage completed,
+    so users see partial results and a retried job can resume after it.
+    """
+    now = datetime.now(timezone.utc)
+    update = {"$set": {
+        **data,
+        f"stages.{stage}.status": "completed",
+        f"stages.{stage}.updated_at": now
+    }}
+    if unset:
+        update["$unset"] = unset
+    try:
+        reports_collection.update_one({"interview_id": interview_id}, update)
+        print(f"💾 Stage saved: {stage}")
+        return True
+    except Exception as e:
+        print(f"❌ Stage Save Error: {e}")
+        return False
+
 def delete_interview(interview_id: str):
     """Removes the record from the database."""
     try:
@@ -82,6 +179,56 @@ def delete_interview(interview_id: str):
         print(f"❌ Delete Error: {e}")
         return False
 
+def _encode_cursor(doc):
+    payload = {
+        "p": bool(doc.get("is_pinned", False)),
+        "c": doc["created_at"].isoformat() if doc.get("created_at") else None,
+        "i": str(doc["_id"])
+    }
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+def _decode_cursor(cursor: str):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        created_at = datetime.fromisoformat(payload["c"]) if payload["c"] else None
+        return payload["p"], created_at, ObjectId(payload["i"])
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {e}")
+
+def list_interviews(limit: int = 20, cursor: str = None, interview_type: str = None, status: str = None, summary: bool = True):
+    """
+    Keyset-paginated listing in dashboard order (pinned first, newest first).
+    Returns (items, next_cursor); next_cursor is None on the last page.
+    status="processing" matches every interview still in the pipeline (neither Completed nor Error...).
+    """
+    query = {}
+    if interview_type:
+        query["interview_type"] = interview_type
+    if status == "processing":
+        query["status"] = {"$ne": "Completed", "$not": re.compile("^Error")}
+    elif status:
+        query["status"] = status
+
+    if cursor:
+        # Everything strictly after the last item of the previous page, in LISTING_SORT order
+        pinned, created_at, last_id = _decode_cursor(cursor)
+        query["$or"] = [
+            {"is_pinned": {"$lt": pinned}},
+            {"is_pinned": pinned, "created_at": {"$lt": created_at}},
+            {"is_pinned": pinned, "created_at": created_at, "_id": {"$lt": last_id}}
+        ]
+
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    projection = SUMMARY_PROJECTION if summary else None
+    # Fetch one extra to know whether another page exists
+    items = list(reports_collection.find(query, projection).sort(LISTING_SORT).limit(limit + 1))
+
+    next_cursor = _encode_cursor(items[limit - 1]) if len(items) > limit else None
+    items = items[:limit]
+    for item in items:
+        item["_id"] = str(item["_id"])
+    return items, next_cursor
+
 def get_all_interviews():
     """Fetches all interviews sorted by pinning and recency."""
     interviews = []
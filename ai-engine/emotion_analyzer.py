@@ -1,10 +1,38 @@
-from fer.fer import FER
 import cv2
+import numpy as np
 import os
 import re
+from contextlib import nullcontext
+from concurrent.futures import as_completed
+from concurrent.futures.process import BrokenProcessPool
+from frame_extractor import get_video_info, iter_sampled_frames, FrameSelector, FRAME_SKIP_THRESHOLD, FRAME_MAX_GAP, FRAME_CHANGE_HOLD
+from face_tracker import FaceTracker, FACE_DETECT_EVERY, FACE_TRACK_MIN_SCORE
+from model_registry import get_model, get_process_pool, discard_process_pool
 
-# Initialize once to save memory
-detector = FER(mtcnn=True) # mtcnn=True is slower but MUCH more accurate
+# "fixed": every 1 fps sample goes through inference; "adaptive": near-duplicate
+# samples reuse the last analysed label (see frame_extractor.FrameSelector)
+EMOTION_SAMPLING = os.getenv("EMOTION_SAMPLING", "fixed").lower()
+
+# Identifies the detector/classifier + sampling combination in cached results
+EMOTION_MODEL_VERSION = "fer-mtcnn-1fps"
+if EMOTION_SAMPLING == "adaptive":
+    EMOTION_MODEL_VERSION += f"-adaptive-{FRAME_SKIP_THRESHOLD}-{FRAME_MAX_GAP}-{FRAME_CHANGE_HOLD}"
+
+# Run MTCNN on keyframes only and track the face box in between (see face_tracker.py)
+EMOTION_FACE_TRACKING = os.getenv("EMOTION_FACE_TRACKING", "false").lower() == "true"
+if EMOTION_FACE_TRACKING:
+    EMOTION_MODEL_VERSION += f"-track-{FACE_DETECT_EVERY}-{FACE_TRACK_MIN_SCORE}"
+
+# How many sampled frames go through MTCNN + the emotion CNN per forward pass
+EMOTION_BATCH_SIZE = int(os.getenv("EMOTION_BATCH_SIZE", "16"))
+
+# Worker processes for the sharded mode (1 = analyse in-process)
+EMOTION_WORKERS = int(os.getenv("EMOTION_WORKERS", "1"))
+
+# FER's defaults for cropping a face box before classification
+FACE_OFFSETS = (10, 10)
+FACE_PADDING = 40
+EMOTION_INPUT_SIZE = (64, 64)
 
 def try_int(s):
     try:
@@ -16,29 +44,286 @@ def natural_key(string_):
     """Helper to sort file names like frame_1, frame_2, frame_10 correctly."""
     return [try_int(c) for c in re.split('([0-9]+)', string_)]
 
-def analyze_emotions_from_frames(frames_folder):
+def dominant_emotion(img, fer_detector=None):
+    """Runs FER on a single BGR frame and returns its dominant emotion label."""
+    result = (fer_detector or get_model("fer")).detect_emotions(img)
+
+    if result:
+        # result[0] is the first face detected
+        scores = result[0]["emotions"]
+        return max(scores, key=scores.get)
+
+    # If no face is found, we record 'unknown' to keep the timeline consistent
+    return "unknown"
+
+def _supports_batching(fer_detector):
+    """
+    Batching needs FER's facenet-pytorch MTCNN (batched `detect`) and its raw classifier
+    hook. FER 21.x-22.4 ships the `mtcnn` package's detector, which only has detect_faces.
+    """
+    mtcnn = getattr(fer_detector, "_mtcnn", None)
+    return hasattr(mtcnn, "detect") and hasattr(fer_detector, "_classify_emotions")
+
+def _find_first_faces(fer_detector, imgs):
+    """Runs MTCNN once over a batch of same-sized frames; returns the first box per frame (or None)."""
+    try:
+        batch_boxes, _ = fer_detector._mtcnn.detect(imgs)
+    except Exception:
+        # Mixed frame sizes cannot be stacked; detect them one by one
+        batch_boxes = [fer_detector._mtcnn.detect(img)[0] for img in imgs]
+
+    first_faces = []
+    for boxes in batch_boxes:
+        if isinstance(boxes, np.ndarray) and len(boxes):
+            x1, y1, x2, y2 = boxes[0]
+            # Same (x, y, w, h) rounding as FER.find_faces
+            first_faces.append([int(x1), int(y1), int(x2) - int(x1), int(y2) - int(y1)])
+        else:
+            first_faces.append(None)
+    return first_faces
+
+def _track_faces(fer_detector, imgs, tracker):
+    """Face box per frame from the tracker, running MTCNN only when it asks for a detection."""
+    boxes = []
+    for img in imgs:
+        box = tracker.track(img)
+        if box is None:
+            box = _find_first_faces(fer_detector, [img])[0]
+            tracker.reset(img, box)
+        boxes.append(box)
+    return boxes
+
+def _pad_value(img):
+    """The constant FER.pad fills its border with: the mean of the frame's bottom two gray rows."""
+    mean = cv2.mean(cv2.cvtColor(img[-2:], cv2.COLOR_BGR2GRAY))[0]
+    return np.uint8(np.clip(np.rint(mean), 0, 255))
+
+def _prepare_face(fer_detector, img, box):
+    """
+    Mirrors FER.detect_emotions' crop/pad/normalise steps for one face box.
+    Only the face ROI is converted to grayscale; the FACE_PADDING border FER adds around
+    the whole frame (filled with _pad_value) is reproduced on the crop.
+    """
+    height, width = img.shape[:2]
+    x, y, w, h = fer_detector.tosquare(box)
+    x_off, y_off = FACE_OFFSETS
+    # FER always pads the frame, so all four bounds move into padded coordinates
+    x1, x2 = x - x_off + FACE_PADDING, x + w + x_off + FACE_PADDING
+    y1, y2 = y - y_off + FACE_PADDING, y + h + y_off + FACE_PADDING
+    x1, y1 = max(x1, 0), max(y1, 0)
+    # Resolve the bounds exactly like the original NumPy slice (negative ends included)
+    x1, x2, _ = slice(x1, x2).indices(width + 2 * FACE_PADDING)
+    y1, y2, _ = slice(y1, y2).indices(height + 2 * FACE_PADDING)
+    if x2 <= x1 or y2 <= y1:
+        return None
+
+    gray_face = np.full((y2 - y1, x2 - x1), _pad_value(img), dtype=np.uint8)
+    # Part of the crop that lies inside the frame, in frame coordinates
+    ix1, iy1 = max(x1 - FACE_PADDING, 0), max(y1 - FACE_PADDING, 0)
+    ix2, iy2 = min(x2 - FACE_PADDING, width), min(y2 - FACE_PADDING, height)
+    if ix2 > ix1 and iy2 > iy1:
+        roi = img[iy1:iy2, ix1:ix2]
+        oy, ox = iy1 + FACE_PADDING - y1, ix1 + FACE_PADDING - x1
+        gray_face[oy:oy + iy2 - iy1, ox:ox + ix2 - ix1] = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
+
+    try:
+        gray_face = cv2.resize(gray_face, EMOTION_INPUT_SIZE)
+    except Exception:
+        return None
+
+    gray_face = gray_face.astype("float32") / 255.0
+    gray_face = (gray_face - 0.5) * 2.0
+    return np.expand_dims(gray_face, -1)
+
+def analyze_emotion_batch(imgs, fer_detector=None, tracker=None):
+    """
+    Batched equivalent of calling dominant_emotion() on each frame:
+    one MTCNN pass for face boxes and one classifier pass over all face crops.
+    With a FaceTracker, boxes come from tracking and MTCNN only runs on keyframes.
+    """
+    fer_detector = fer_detector or get_model("fer")
+    if not imgs:
+        return []
+
+    if not _supports_batching(fer_detector):
+        return [dominant_emotion(img, fer_detector) for img in imgs]
+
+    labels = fer_detector._get_labels()
+
+    emotions = ["unknown"] * len(imgs)
+    faces, face_slots = [], []
+    boxes = _track_faces(fer_detector, imgs, tracker) if tracker is not None else _find_first_faces(fer_detector, imgs)
+    for i, (img, box) in enumerate(zip(imgs, boxes)):
+        if box is None:
+            continue
+        face = _prepare_face(fer_detector, img, box)
+        if face is not None:
+            faces.append(face)
+            face_slots.append(i)
+
+    if faces:
+        predictions = fer_detector._classify_emotions(np.array(faces))
+        for slot, scores in zip(face_slots, predictions):
+            # Round like FER does so ties resolve the same way as the per-frame path
+            labelled = {labels[idx]: round(float(score), 2) for idx, score in enumerate(scores)}
+            emotions[slot] = max(labelled, key=labelled.get)
+
+    return emotions
+
+def analyze_emotions_from_stream(frames, batch_size=None, on_batch=None, adaptive=None, tracking=None, metrics=None):
+    """
+    Consumes (timestamp, ndarray) pairs, e.g. from frame_extractor.iter_sampled_frames,
+    and returns the per-frame dominant-emotion list in timeline order.
+    Frames are accumulated into batches of `batch_size` for inference;
+    `on_batch(frames_done)` is called after each one.
+    With `adaptive` (default: EMOTION_SAMPLING), near-duplicate frames skip inference
+    and take the label of the frame before them, so the timeline stays fully populated.
+    With `tracking` (default: EMOTION_FACE_TRACKING), faces are tracked between keyframes.
+    `metrics` (a metrics.PipelineMetrics) gets decode time as "frame_sampling" and inference as "fer".
+    """
+    batch_size = batch_size or EMOTION_BATCH_SIZE
+    adaptive = (EMOTION_SAMPLING == "adaptive") if adaptive is None else adaptive
+    tracking = EMOTION_FACE_TRACKING if tracking is None else tracking
+    selector = FrameSelector() if adaptive else None
+    tracker = FaceTracker() if tracking else None
     emotions = []
-    
+    batch = []
+    batch_slots = []
+
+    if metrics is not None:
+        frames = metrics.timed_iter("frame_sampling", frames)
+
+    def flush():
+        with metrics.stage("fer") if metrics is not None else nullcontext():
+            results = analyze_emotion_batch(batch, tracker=tracker)
+        for slot, emotion in zip(batch_slots, results):
+            emotions[slot] = emotion
+        batch.clear()
+        batch_slots.clear()
+
+    for _, img in frames:
+        if img is None:
+            continue
+        emotions.append(None)
+        if selector is not None and not selector.should_analyze(img):
+            continue  # Carried forward below
+        batch.append(img)
+        batch_slots.append(len(emotions) - 1)
+        if len(batch) >= batch_size:
+            flush()
+            if on_batch:
+                on_batch(len(emotions))
+
+    flush()
+    if on_batch:
+        on_batch(len(emotions))
+
+    if selector is not None:
+        # The first frame is always analysed, so every skipped one has a label to inherit
+        for i in range(1, len(emotions)):
+            if emotions[i] is None:
+                emotions[i] = emotions[i - 1]
+        print(f"🎞️ Adaptive sampling: analysed {selector.analysed}, reused {selector.skipped} frames")
+    if tracker is not None:
+        print(f"🎯 Face tracking: {tracker.detections} detections, {tracker.tracked} tracked frames")
+    return emotions
+
+def analyze_emotions_from_frames(frames_folder, batch_size=None):
     # 🔥 FIX: Sort frames numerically so the timeline is correct
     frame_names = os.listdir(frames_folder)
     frame_names.sort(key=natural_key)
 
-    for frame_name in frame_names:
-        frame_path = os.path.join(frames_folder, frame_name)
-        img = cv2.imread(frame_path)
+    def read_frames():
+        for index, frame_name in enumerate(frame_names):
+            yield index, cv2.imread(os.path.join(frames_folder, frame_name))
 
-        if img is None:
-            continue
+    return analyze_emotions_from_stream(read_frames(), batch_size=batch_size)
 
-        result = detector.detect_emotions(img)
+def _analyze_shard(video_path, start_frame, end_frame, batch_size):
+    """Worker entry point: decodes and analyses one contiguous [start, end) frame range."""
+    # Each spawned worker loads its own detector once, via the registry
+    frames = iter_sampled_frames(video_path, start_frame=start_frame, end_frame=end_frame)
+    return analyze_emotions_from_stream(frames, batch_size=batch_size)
 
-        if result:
-            # result[0] is the first face detected
-            scores = result[0]["emotions"]
-            dominant = max(scores, key=scores.get)
-            emotions.append(dominant)
-        else:
-            # If no face is found, we record 'unknown' to keep the timeline consistent
-            emotions.append("unknown")
+def _expected_samples(frame_count, interval):
+    return -(-frame_count // interval)
+
+def _plan_shards(frame_count, interval, workers):
+    """Splits [0, frame_count) into contiguous ranges aligned to the sampling interval."""
+    samples = _expected_samples(frame_count, interval)
+    per_shard = -(-samples // workers)
+    shards = []
+    for start_sample in range(0, samples, per_shard):
+        start = start_sample * interval
+        end = (start_sample + per_shard) * interval
+        shards.append((start, end))
+    if shards:
+        # Container frame counts are estimates; let the last shard run to EOF
+        shards[-1] = (shards[-1][0], None)
+    return shards
+
+def analyze_emotions_parallel(video_path, workers=None, batch_size=None, progress=None):
+    """
+    Shards the video timeline across a process pool, one detector per worker,
+    and merges the per-frame emotions back in timeline order.
+    `progress(frames_done, frames_total)` is called as shards finish.
+    """
+    workers = workers or EMOTION_WORKERS
+    batch_size = batch_size or EMOTION_BATCH_SIZE
+    fps, frame_count = get_video_info(video_path)
+    interval = max(int(fps), 1)
+    shards = _plan_shards(frame_count, interval, workers)
+    total = _expected_samples(frame_count, interval)
+
+    if len(shards) <= 1:
+        on_batch = (lambda done: progress(done, total)) if progress else None
+        return analyze_emotions_from_stream(iter_sampled_frames(video_path), batch_size=batch_size, on_batch=on_batch)
+
+    # Reused across jobs: pool workers keep their detector loaded
+    pool = get_process_pool("emotions", workers)
+    try:
+        futures = [
+            pool.submit(_analyze_shard, video_path, start, end, batch_size)
+            for start, end in shards
+        ]
+        if progress:
+            done = 0
+            for future in as_completed(futures):
+                done += len(future.result())
+                progress(done, total)
+
+        emotions = []
+        for future in futures:
+            emotions.extend(future.result())
+    except BrokenProcessPool:
+        discard_process_pool("emotions")
+        raise
+
+    return emotions
+
+def analyze_video_emotions(video_path, workers=None, batch_size=None, progress=None, media=None, metrics=None):
+    """
+    Entry point for the pipeline: sharded across processes when workers > 1, streamed otherwise.
+    `progress(frames_done, frames_total)` reports how far the analysis has got.
+    `media` is an optional media_ingest.MediaIngest whose shared demux supplies the frames.
+    """
+    workers = workers or EMOTION_WORKERS
+    if workers > 1:
+        if media is not None:
+            media.release("frames")  # Shards seek into the file from their own processes
+        # Decode and inference happen inside the shard processes; timed together
+        with metrics.stage("fer") if metrics is not None else nullcontext():
+            return analyze_emotions_parallel(video_path, workers=workers, batch_size=batch_size, progress=progress)
+
+    if media is not None:
+        frames = media.frames()
+        fps, frame_count = media.fps, media.frame_count
+    else:
+        frames = iter_sampled_frames(video_path)
+        fps, frame_count = get_video_info(video_path) if progress else (30, 0)
 
-    return emotions
\ No newline at end of file
+    on_batch = None
+    if progress:
+        total = _expected_samples(frame_count, max(int(fps), 1))
+        on_batch = lambda done: progress(done, total)
+    return analyze_emotions_from_stream(frames, batch_size=batch_size, on_batch=on_batch, metrics=metrics)
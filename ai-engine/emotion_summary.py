@@ -1,77 +1,196 @@
-from collections import Counter
+import os
+import numpy as np
 from datetime import timedelta
 
-def summarize_emotions(frame_emotions, fps=1):
+ALL_EMOTIONS = ["happy", "neutral", "sad", "surprise", "angry", "disgust", "fear"]
+STRESS_EMOTIONS = {"fear", "sad", "angry", "disgust"}
+UNKNOWN_CODE = -1
+
+# Compatibility: also emit the per-second "MM:SS" -> 7-key dict map the current dashboard charts
+EMOTION_LEGACY_TIMELINE = os.getenv("EMOTION_LEGACY_TIMELINE", "true").lower() == "true"
+
+# Bump whenever summarize_emotions' output changes so stored summaries get re-scored
+EMOTION_SUMMARY_VERSION = "1" + ("+legacy" if EMOTION_LEGACY_TIMELINE else "")
+
+def encode_emotions(frame_emotions):
+    """Maps labels to integer codes (index into the returned label list, -1 for 'unknown')."""
+    labels = list(ALL_EMOTIONS)
+    lookup = {emo: i for i, emo in enumerate(labels)}
+    codes = np.empty(len(frame_emotions), dtype=np.int8)
+    for i, emo in enumerate(frame_emotions):
+        if emo == "unknown":
+            codes[i] = UNKNOWN_CODE
+            continue
+        if emo not in lookup:
+            lookup[emo] = len(labels)
+            labels.append(emo)
+        codes[i] = lookup[emo]
+    return codes, labels
+
+def run_lengths(codes):
+    """Run-length encodes an int array into (values, starts, lengths)."""
+    if len(codes) == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty
+    starts = np.flatnonzero(np.concatenate(([True], codes[1:] != codes[:-1])))
+    lengths = np.diff(np.append(starts, len(codes)))
+    return codes[starts], starts, lengths
+
+def compact_timeline(codes, labels, fps=1):
+    """Columnar timeline: label codes + run lengths, one sample per `resolution` seconds."""
+    values, _, lengths = run_lengths(codes)
+    return {
+        "labels": labels,
+        "resolution": 1 / fps,
+        "codes": values.tolist(),
+        "lengths": lengths.tolist()
+    }
+
+def expand_timeline(timeline):
+    """Back to one code per sample (np.int8 array)."""
+    return np.repeat(
+        np.asarray(timeline["codes"], dtype=np.int8),
+        np.asarray(timeline["lengths"], dtype=np.int64)
+    )
+
+def timeline_labels(timeline):
+    """Per-sample labels back from a compact timeline ('unknown' where no face was found)."""
+    labels = timeline["labels"]
+    return [labels[c] if c != UNKNOWN_CODE else "unknown" for c in expand_timeline(timeline).tolist()]
+
+def downsample_timeline(timeline, resolution):
+    """
+    Re-buckets a compact timeline to `resolution` seconds per sample, keeping the
+    most frequent known emotion of each bucket (unknown only if the bucket has no face).
+    """
+    step = max(int(round(resolution / timeline["resolution"])), 1)
+    if step == 1:
+        return timeline
+
+    codes = expand_timeline(timeline)
+    n_buckets = -(-len(codes) // step)
+    padded = np.full(n_buckets * step, UNKNOWN_CODE, dtype=np.int16)
+    padded[:len(codes)] = codes
+    buckets = padded.reshape(n_buckets, step)
+
+    # Per-bucket histogram over known labels; ties go to the lower code
+    n_labels = len(timeline["labels"])
+    counts = np.zeros((n_buckets, n_labels + 1), dtype=np.int32)
+    np.add.at(counts, (np.repeat(np.arange(n_buckets), step), buckets.ravel() + 1), 1)
+    known = counts[:, 1:]
+    bucket_codes = np.where(known.any(axis=1), known.argmax(axis=1), UNKNOWN_CODE).astype(np.int8)
+
+    values, _, lengths = run_lengths(bucket_codes)
+    return {
+        **timeline,
+        "resolution": timeline["resolution"] * step,
+        "codes": values.tolist(),
+        "lengths": lengths.tolist()
+    }
+
+def slice_timeline(timeline, start=None, end=None):
+    """Cuts a compact timeline to the [start, end) seconds range; `start` records the offset."""
+    codes = expand_timeline(timeline)
+    resolution = timeline["resolution"]
+    first = max(int(start // resolution), 0) if start else 0
+    last = min(int(-(-end // resolution)), len(codes)) if end is not None else len(codes)
+
+    values, _, lengths = run_lengths(codes[first:max(first, last)])
+    return {
+        **timeline,
+        "start": timeline.get("start", 0) + first * resolution,
+        "codes": values.tolist(),
+        "lengths": lengths.tolist()
+    }
+
+def legacy_percentages(codes, labels, fps=1):
+    """The original per-second {"MM:SS": {emotion: 0|100}} map, for the existing charts."""
+    timeline_data = {}
+    for i in np.flatnonzero(codes != UNKNOWN_CODE):
+        # Convert frame index to MM:SS format
+        seconds = int(i) // fps
+        timestamp = f"{seconds // 60:02d}:{seconds % 60:02d}"
+
+        # We mark the detected emotion as 100% for that second to create the area chart flow
+        entry = {e: 0 for e in ALL_EMOTIONS}
+        entry[labels[codes[i]]] = 100
+        timeline_data[timestamp] = entry
+    return timeline_data
+
+def timeline_from_legacy(emotion_percentages):
+    """Rebuilds a compact timeline from a stored legacy "MM:SS" map (reports saved before emotion_timeline)."""
+    labels = list(ALL_EMOTIONS)
+    seconds = {}
+    for timestamp, entry in emotion_percentages.items():
+        minutes, secs = timestamp.split(":")
+        seconds[int(minutes) * 60 + int(secs)] = max(entry, key=entry.get)
+
+    codes = np.full(max(seconds) + 1 if seconds else 0, UNKNOWN_CODE, dtype=np.int8)
+    for second, emo in seconds.items():
+        codes[second] = labels.index(emo)
+    return compact_timeline(codes, labels)
+
+def summarize_emotions(frame_emotions, fps=1, legacy_timeline=None):
     """
     Analyzes a list of emotions detected per frame/second.
     frame_emotions: list of strings (e.g., ["happy", "neutral", "unknown", "sad"...])
     """
+    legacy_timeline = EMOTION_LEGACY_TIMELINE if legacy_timeline is None else legacy_timeline
+    codes, labels = encode_emotions(frame_emotions)
+
     # Filter out 'unknown' for global stats calculations
-    valid_emotions = [e for e in frame_emotions if e != "unknown"]
-    total_frames = len(frame_emotions)
-    total_valid = len(valid_emotions)
+    known = codes != UNKNOWN_CODE
+    known_codes = codes[known]
+    total_valid = len(known_codes)
 
     if total_valid == 0:
         return {"error": "No faces detected in the video"}
 
-    # 1. Global Percentages (For the Cards)
-    counts = Counter(valid_emotions)
-    global_percentages = {emo: round((c / total_valid) * 100, 2) for emo, c in counts.items()}
+    # 1. Global Percentages (For the Cards), in first-seen order like Counter
+    counts = np.bincount(known_codes, minlength=len(labels))
+    _, first_seen = np.unique(known_codes, return_index=True)
+    seen_order = known_codes[np.sort(first_seen)]
+    global_percentages = {
+        labels[c]: round((int(counts[c]) / total_valid) * 100, 2) for c in seen_order
+    }
 
-    # 2. Dominant Emotion
-    dominant = counts.most_common(1)[0][0]
+    # 2. Dominant Emotion (ties go to the first-seen label, as Counter.most_common did)
+    dominant = labels[seen_order[np.argmax(counts[seen_order])]]
 
-    # 3. 📊 NEW: Time-Series Timeline (For the Recharts Chart)
-    # This creates a data point for every second so the chart has a 'path'
-    timeline_data = {}
-    ALL_EMOTIONS = ["happy", "neutral", "sad", "surprise", "angry", "disgust", "fear"]
-    
-    for i, emo in enumerate(frame_emotions):
-        # Convert frame index to MM:SS format
-        seconds = i // fps
-        timestamp = f"{seconds // 60:02d}:{seconds % 60:02d}"
-        
-        # In a real per-second timeline, we mark the detected emotion as 100% 
-        # for that specific second to create the area chart flow.
-        if emo != "unknown":
-            entry = {e: 0 for e in ALL_EMOTIONS}
-            entry[emo] = 100
-            timeline_data[timestamp] = entry
-
-    # 4. Stability Calculation
-    changes = 0
-    for i in range(1, len(frame_emotions)):
-        if frame_emotions[i] == "unknown" or frame_emotions[i-1] == "unknown":
-            continue
-        if frame_emotions[i] != frame_emotions[i-1]:
-            changes += 1
-    
+    # 3. Stability: emotion changes between consecutive known frames
+    pairs_known = known[1:] & known[:-1]
+    changes = int(np.count_nonzero(pairs_known & (codes[1:] != codes[:-1])))
     stability = round(100 - (changes / total_valid * 100), 2)
 
-    # 5. Stress Timeline (Fear, Sad, Angry)
-    stress_emotions = {"fear", "sad", "angry", "disgust"}
+    # 4. Stress Timeline (Fear, Sad, Angry): runs of stress emotions over the known frames.
+    # A run ends at the frame before the next known non-stress emotion; unknown frames
+    # don't break it, and a run still open at the end of the video is not reported.
+    stress_codes = [labels.index(e) for e in STRESS_EMOTIONS if e in labels]
+    known_idx = np.flatnonzero(known)
+    is_stress = np.isin(known_codes, stress_codes)
+    flags, run_starts, run_lens = run_lengths(is_stress.astype(np.int8))
     stress_moments = []
-    start = None
+    for flag, start, length in zip(flags, run_starts, run_lens):
+        next_known = start + length
+        if flag and next_known < len(known_idx):
+            stress_moments.append((int(known_idx[start]), int(known_idx[next_known]) - 1))
 
-    for i, emo in enumerate(frame_emotions):
-        if emo in stress_emotions:
-            if start is None: start = i
-        elif emo != "unknown":
-            if start is not None:
-                stress_moments.append((start, i - 1))
-                start = None
-
-    # 6. Confidence Score
+    # 5. Confidence Score
     confidence = round(global_percentages.get("neutral", 0) + global_percentages.get("happy", 0), 2)
 
-    return {
+    report = {
         "dominant_emotion": dominant,
         "global_percentages": global_percentages,
-        "emotion_percentages": timeline_data,  # 🔥 This is what the chart uses
+    }
+    if legacy_timeline:
+        report["emotion_percentages"] = legacy_percentages(codes, labels, fps)  # 🔥 This is what the chart uses
+    report.update({
+        "emotion_timeline": compact_timeline(codes, labels, fps),  # 🔥 Compact columnar timeline
         "emotional_stability": max(0, stability),
         "confidence_score": min(100, confidence),
         "stress_timeline": [
             {"start": str(timedelta(seconds=s//fps)), "end": str(timedelta(seconds=e//fps))}
             for s, e in stress_moments
         ]
-    }
\ No newline at end of file
+    })
+    return report
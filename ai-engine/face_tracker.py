@@ -0,0 +1,66 @@
+import os
+import cv2
+
+# Detect-once / track-between: MTCNN runs on keyframes only, and the face box is followed
+# in between by template matching in a small window around its last position.
+FACE_DETECT_EVERY = int(os.getenv("FACE_DETECT_EVERY", "10"))          # Keyframe interval, in samples
+FACE_TRACK_MIN_SCORE = float(os.getenv("FACE_TRACK_MIN_SCORE", "0.6"))  # Re-detect below this match score
+FACE_TRACK_SEARCH = float(os.getenv("FACE_TRACK_SEARCH", "0.5"))        # Search margin, fraction of box size
+
+class FaceTracker:
+    """
+    Follows one face box across consecutive samples. `track()` returns the box in a
+    new frame, or None when a detection is due (keyframe, lost track, low confidence).
+    """
+
+    def __init__(self, detect_every=None, min_score=None, search=None):
+        self.detect_every = FACE_DETECT_EVERY if detect_every is None else detect_every
+        self.min_score = FACE_TRACK_MIN_SCORE if min_score is None else min_score
+        self.search = FACE_TRACK_SEARCH if search is None else search
+        self.box = None
+        self.template = None
+        self.since_detect = 0
+        self.detections = 0
+        self.tracked = 0
+
+    def reset(self, img, box):
+        """Starts tracking from a fresh detection (box is (x, y, w, h) or None)."""
+        self.detections += 1
+        self.since_detect = 0
+        self.box = self.template = None
+        if box is None:
+            return
+
+        height, width = img.shape[:2]
+        x, y, w, h = box
+        x1, y1 = max(x, 0), max(y, 0)
+        x2, y2 = min(x + w, width), min(y + h, height)
+        if x2 - x1 < 8 or y2 - y1 < 8:
+            return
+        self.box = [x1, y1, x2 - x1, y2 - y1]
+        self.template = cv2.cvtColor(img[y1:y2, x1:x2], cv2.COLOR_BGR2GRAY)
+
+    def track(self, img):
+        if self.box is None or self.since_detect + 1 >= self.detect_every:
+            return None
+
+        height, width = img.shape[:2]
+        x, y, w, h = self.box
+        margin_x, margin_y = int(w * self.search), int(h * self.search)
+        sx1, sy1 = max(x - margin_x, 0), max(y - margin_y, 0)
+        sx2, sy2 = min(x + w + margin_x, width), min(y + h + margin_y, height)
+        if sx2 - sx1 < w or sy2 - sy1 < h:
+            return None
+
+        # Only the search window is converted and scanned, never the full frame
+        window = cv2.cvtColor(img[sy1:sy2, sx1:sx2], cv2.COLOR_BGR2GRAY)
+        scores = cv2.matchTemplate(window, self.template, cv2.TM_CCOEFF_NORMED)
+        _, score, _, (dx, dy) = cv2.minMaxLoc(scores)
+        if score < self.min_score:
+            return None
+
+        # The template stays the keyframe's crop so errors don't accumulate between detections
+        self.box = [sx1 + dx, sy1 + dy, w, h]
+        self.since_detect += 1
+        self.tracked += 1
+        return list(self.box)
@@ -1,46 +1,171 @@
 import cv2
 import os
+import numpy as np
 from uuid import uuid4
 
-def extract_frames_from_video(video_path):
-    # 1. Generate a unique folder name to prevent Windows Access Errors
-    unique_id = str(uuid4())[:8]
-    frames_folder = f"temp_frames_{unique_id}"
-    os.makedirs(frames_folder, exist_ok=True)
+# Adaptive sampling: a sample is only sent to inference when it differs enough from the
+# last analysed one (mean abs difference of 32x32 grayscale thumbnails, 0..1)
+FRAME_SKIP_THRESHOLD = float(os.getenv("FRAME_SKIP_THRESHOLD", "0.02"))
+# Longest run of samples whose label is carried forward without re-analysis
+FRAME_MAX_GAP = int(os.getenv("FRAME_MAX_GAP", "5"))
+# After motion between consecutive samples, this many following samples are always analysed
+FRAME_CHANGE_HOLD = int(os.getenv("FRAME_CHANGE_HOLD", "2"))
+# How far before a shard's first frame to seek, so the decoder starts from an earlier keyframe
+FRAME_SEEK_PREROLL = int(os.getenv("FRAME_SEEK_PREROLL", "250"))
+
+def get_video_info(video_path):
+    """Returns (fps, frame_count) from the container metadata, with the usual 30 fps fallback."""
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    return (fps if fps > 0 else 30), frame_count
+
+def _grabbed_index(cap, fps):
+    """Timeline index of the last grabbed frame, from its decoded timestamp."""
+    return int(round(cap.get(cv2.CAP_PROP_POS_MSEC) * fps / 1000))
 
+def _seek_to_frame(cap, frame_index, fps):
+    """
+    Leaves `cap` with frame `frame_index` grabbed. CAP_PROP_POS_FRAMES seeks are not
+    frame-accurate on their own, so this seeks FRAME_SEEK_PREROLL frames earlier (the
+    demuxer falls back to the keyframe before that), then decodes forward checking each
+    frame's timestamp. Returns False when the timestamps can't place the frame.
+    """
+    back = FRAME_SEEK_PREROLL
+    while True:
+        seek_to = max(frame_index - back, 0)
+        cap.set(cv2.CAP_PROP_POS_FRAMES, seek_to)
+        if not cap.grab():
+            return False
+        current = _grabbed_index(cap, fps)
+        if current <= frame_index or seek_to == 0:
+            break
+        back *= 2  # Landed past the target: start from an earlier keyframe
+
+    while current < frame_index:
+        if not cap.grab():
+            return False
+        following = _grabbed_index(cap, fps)
+        if following <= current:
+            return False  # No usable timestamps
+        current = following
+    return current == frame_index
+
+def iter_sampled_frames(video_path, every_seconds=1, start_frame=0, end_frame=None):
+    """
+    Streams one frame per `every_seconds` of video as (timestamp, ndarray) pairs.
+    Frames in between are only grabbed (demuxed) and never converted or written
+    to disk, so the emotion stage can consume frames as they are decoded.
+    `start_frame`/`end_frame` restrict the scan to a [start, end) range of the timeline.
+    """
     cap = cv2.VideoCapture(video_path)
-    
+
     if not cap.isOpened():
         print(f"❌ Error: Could not open video {video_path}")
-        return frames_folder
+        return
 
-    # 2. Get the ACTUAL Frame Rate of the video
     video_fps = cap.get(cv2.CAP_PROP_FPS)
     if video_fps <= 0:
         video_fps = 30  # Fallback to 30 if metadata is missing
-    
-    # Calculate how many frames to skip to get exactly 1 frame per second
-    interval = int(video_fps)
+
+    # Same sampling grid as the legacy JPEG extractor: every `interval`-th frame
+    interval = max(int(video_fps * every_seconds), 1)
 
     count = 0
-    saved_count = 0
+    grabbed = False
+    if start_frame > 0:
+        grabbed = _seek_to_frame(cap, start_frame, video_fps)
+        if not grabbed:
+            # Count frames from the start instead: slow, but never off by a frame
+            cap.release()
+            cap = cv2.VideoCapture(video_path)
+            while count < start_frame and cap.grab():
+                count += 1
+        count = start_frame
 
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
+    try:
+        while end_frame is None or count < end_frame:
+            # grab() advances without the BGR conversion; we only retrieve() samples
+            if not grabbed and not cap.grab():
+                break
+            grabbed = False
 
-        # 3. Save exactly one frame for every second of video
-        if count % interval == 0:
-            # We use leading zeros (e.g., 0001.jpg) so os.listdir sorts them correctly later
-            frame_name = os.path.join(frames_folder, f"frame_{saved_count:04d}.jpg")
-            cv2.imwrite(frame_name, frame)
-            saved_count += 1
+            if count % interval == 0:
+                ret, frame = cap.retrieve()
+                if ret:
+                    yield count / video_fps, frame
 
-        count += 1
+            count += 1
+    finally:
+        # CRITICAL: Release the file lock even if the consumer stops early
+        cap.release()
+
+def frame_signature(img, size=32):
+    """Cheap content fingerprint: a downscaled grayscale copy of the frame."""
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    return cv2.resize(gray, (size, size), interpolation=cv2.INTER_AREA).astype(np.float32)
+
+def frame_difference(a, b):
+    """0 for identical signatures, 1 for black vs white."""
+    return float(np.mean(np.abs(a - b))) / 255
+
+class FrameSelector:
+    """
+    Decides, sample by sample, whether a frame needs inference. Near-duplicates of the
+    last analysed frame are skipped (the caller carries its label forward), while motion
+    or scene changes make the following samples analysed densely again. No more than
+    `max_gap` consecutive samples are ever skipped.
+    """
+
+    def __init__(self, threshold=None, max_gap=None, change_hold=None):
+        self.threshold = FRAME_SKIP_THRESHOLD if threshold is None else threshold
+        self.max_gap = FRAME_MAX_GAP if max_gap is None else max_gap
+        self.change_hold = FRAME_CHANGE_HOLD if change_hold is None else change_hold
+        self.reference = None
+        self.previous = None
+        self.gap = 0
+        self.hold = 0
+        self.analysed = 0
+        self.skipped = 0
+
+    def should_analyze(self, img):
+        signature = frame_signature(img)
+        if self.previous is not None and frame_difference(signature, self.previous) >= self.threshold:
+            self.hold = self.change_hold + 1  # Includes this sample
+        self.previous = signature
+
+        analyse = (
+            self.reference is None
+            or self.hold > 0
+            or self.gap >= self.max_gap
+            or frame_difference(signature, self.reference) >= self.threshold
+        )
+        self.hold = max(self.hold - 1, 0)
+
+        if analyse:
+            self.reference = signature
+            self.gap = 0
+            self.analysed += 1
+        else:
+            self.gap += 1
+            self.skipped += 1
+        return analyse
+
+def extract_frames_from_video(video_path):
+    """Legacy path: writes the 1 fps samples as JPEGs into a temp folder."""
+    # 1. Generate a unique folder name to prevent Windows Access Errors
+    unique_id = str(uuid4())[:8]
+    frames_folder = f"temp_frames_{unique_id}"
+    os.makedirs(frames_folder, exist_ok=True)
+
+    saved_count = 0
+    for _, frame in iter_sampled_frames(video_path):
+        # We use leading zeros (e.g., 0001.jpg) so os.listdir sorts them correctly later
+        frame_name = os.path.join(frames_folder, f"frame_{saved_count:04d}.jpg")
+        cv2.imwrite(frame_name, frame)
+        saved_count += 1
 
-    # 4. CRITICAL: Release the file lock so Windows can delete the folder later
-    cap.release()
     print(f"✅ Extracted {saved_count} frames to {frames_folder}")
-    
-    return frames_folder
\ No newline at end of file
+
+    return frames_folder
@@ -0,0 +1,160 @@
+import os
+import uuid
+from datetime import datetime, timezone, timedelta
+from pymongo import ASCENDING, ReturnDocument
+from database import db
+
+# Durable queue: the API enqueues, worker.py processes claim jobs with a lease
+jobs_collection = db["jobs"]
+
+# A job whose lease is not renewed within this window is considered abandoned
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "120"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+
+# Backpressure: how many queued + running jobs we accept, and what to do beyond that
+MAX_PENDING_JOBS = int(os.getenv("MAX_PENDING_JOBS", "50"))
+QUEUE_FULL_POLICY = os.getenv("QUEUE_FULL_POLICY", "reject")  # "reject" or "queue"
+
+class QueueFullError(Exception):
+    """Raised when the queue is at MAX_PENDING_JOBS and the policy is to reject."""
+
+def _now():
+    return datetime.now(timezone.utc)
+
+def ensure_job_indexes():
+    """Indexes used by claim_job and the per-interview lookups."""
+    jobs_collection.create_index([("status", ASCENDING), ("created_at", ASCENDING)])
+    jobs_collection.create_index([("status", ASCENDING), ("lease_expires_at", ASCENDING)])
+    jobs_collection.create_index("interview_id")
+
+def pending_job_count():
+    return jobs_collection.count_documents({"status": {"$in": ["queued", "running"]}})
+
+def job_status_counts():
+    """{status: number of jobs}, e.g. {"queued": 3, "running": 2, "completed": 40}."""
+    return {
+        row["_id"]: row["count"]
+        for row in jobs_collection.aggregate([{"$group": {"_id": "$status", "count": {"$sum": 1}}}])
+    }
+
+def has_capacity():
+    """False when a new upload should be turned away before it is even written to disk."""
+    return QUEUE_FULL_POLICY != "reject" or pending_job_count() < MAX_PENDING_JOBS
+
+def enqueue_job(interview_id: str, video_path: str, content_hash: str = None, interview_type: str = None):
+    """Persists a pipeline job; workers on any machine sharing the database can pick it up."""
+    if not has_capacity():
+        raise QueueFullError(f"{MAX_PENDING_JOBS} jobs already pending")
+
+    job = {
+        "job_id": str(uuid.uuid4()),
+        "interview_id": interview_id,
+        "video_path": video_path,
+        "content_hash": content_hash,
+        "interview_type": interview_type,
+        "status": "queued",
+        "attempts": 0,
+        "worker_id": None,
+        "lease_expires_at": None,
+        "error": None,
+        "created_at": _now()
+    }
+    jobs_collection.insert_one(job)
+    print(f"📥 Job queued: {job['job_id']} (interview {interview_id})")
+    return job["job_id"]
+
+def claim_job(worker_id: str):
+    """
+    Atomically takes the oldest queued job, or a running job whose lease expired
+    (its worker died), and leases it to `worker_id`. Returns None when idle.
+    """
+    now = _now()
+    return jobs_collection.find_one_and_update(
+        {
+            "attempts": {"$lt": JOB_MAX_ATTEMPTS},
+            "$or": [
+                {"status": "queued"},
+                {"status": "running", "lease_expires_at": {"$lt": now}}
+            ]
+        },
+        {
+            "$set": {
+                "status": "running",
+                "worker_id": worker_id,
+                "started_at": now,
+                "heartbeat_at": now,
+                "lease_expires_at": now + timedelta(seconds=JOB_LEASE_SECONDS)
+            },
+            "$inc": {"attempts": 1}
+        },
+        sort=[("created_at", ASCENDING)],
+        return_document=ReturnDocument.AFTER
+    )
+
+def heartbeat_job(job_id: str, worker_id: str):
+    """Extends the lease. Returns False if another worker has taken the job over."""
+    now = _now()
+    result = jobs_collection.update_one(
+        {"job_id": job_id, "worker_id": worker_id, "status": "running"},
+        {"$set": {
+            "heartbeat_at": now,
+            "lease_expires_at": now + timedelta(seconds=JOB_LEASE_SECONDS)
+        }}
+    )
+    return result.matched_count > 0
+
+def complete_job(job_id: str, worker_id: str):
+    """Returns the matched count: 0 when the worker no longer holds the job's lease."""
+    result = jobs_collection.update_one(
+        {"job_id": job_id, "worker_id": worker_id, "status": "running"},
+        {"$set": {"status": "completed", "finished_at": _now(), "lease_expires_at": None}}
+    )
+    return result.matched_count
+
+def fail_job(job_id: str, worker_id: str, error: str):
+    """
+    Puts the job back in the queue, or marks it failed once JOB_MAX_ATTEMPTS is used up.
+    Returns the new status, or None when the worker no longer holds the job's lease.
+    """
+    owned = {"job_id": job_id, "worker_id": worker_id, "status": "running"}
+    job = jobs_collection.find_one(owned, {"attempts": 1})
+    if not job:
+        return None
+
+    status = "failed" if job.get("attempts", 0) >= JOB_MAX_ATTEMPTS else "queued"
+    result = jobs_collection.update_one(
+        {**owned, "attempts": job.get("attempts", 0)},
+        {"$set": {"status": status, "error": error, "lease_expires_at": None, "finished_at": _now()}}
+    )
+    return status if result.matched_count else None
+
+def cancel_jobs(interview_id: str):
+    """
+    Cancels the interview's queued and running jobs so nobody claims them again; a worker
+    still running one loses its lease on the next heartbeat. Returns how many were cancelled.
+    """
+    result = jobs_collection.update_many(
+        {"interview_id": interview_id, "status": {"$in": ["queued", "running"]}},
+        {"$set": {"status": "cancelled", "lease_expires_at": None, "finished_at": _now()}}
+    )
+    return result.modified_count
+
+def reap_exhausted_jobs():
+    """
+    Jobs whose lease expired on their final attempt can never be claimed again;
+    mark them failed and hand back their interview ids so the caller can flag them.
+    """
+    now = _now()
+    query = {
+        "status": "running",
+        "lease_expires_at": {"$lt": now},
+        "attempts": {"$gte": JOB_MAX_ATTEMPTS}
+    }
+    interview_ids = [job["interview_id"] for job in jobs_collection.find(query, {"interview_id": 1})]
+    if interview_ids:
+        jobs_collection.update_many(query, {"$set": {
+            "status": "failed",
+            "error": "Lease expired on final attempt",
+            "finished_at": now
+        }})
+    return interview_ids
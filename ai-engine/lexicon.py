@@ -0,0 +1,84 @@
+import os
+import hashlib
+from collections import Counter, defaultdict
+from spacy.matcher import PhraseMatcher
+
+# Per-interview-type lexicons live in LEXICON_DIR/<interview_type>/<category>.txt,
+# one term per line ('#' starts a comment). They extend the built-in defaults.
+LEXICON_DIR = os.getenv("LEXICON_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "lexicons"))
+
+class LexiconMatcher:
+    """
+    All lexicon categories compiled into a single spaCy PhraseMatcher over lower-cased
+    tokens, so one linear pass over a Doc counts every category and multi-word
+    entries ("machine learning", "you know") match as phrases.
+    """
+
+    def __init__(self, nlp, lexicons: dict):
+        self.matcher = PhraseMatcher(nlp.vocab, attr="LOWER")
+        for category, terms in lexicons.items():
+            terms = sorted({t.strip().lower() for t in terms if t.strip()})
+            # Tokenizer only; no tagger/parser cost at build time
+            self.matcher.add(category, list(nlp.tokenizer.pipe(terms)))
+
+    def match(self, doc):
+        """Returns {category: Counter(term -> occurrences)} for a Doc or Span."""
+        found = defaultdict(Counter)
+        # as_spans keeps offsets correct when `doc` is a Span of a larger Doc
+        for span in self.matcher(doc, as_spans=True):
+            found[span.label_][span.text.lower()] += 1
+        return found
+
+def lexicon_folder(interview_type: str, base_dir: str = None):
+    """
+    LEXICON_DIR/<interview_type>, or None. interview_type comes straight from the upload
+    form, so only the names of existing subdirectories are accepted, never a path.
+    """
+    base_dir = base_dir or LEXICON_DIR
+    if not interview_type or not os.path.isdir(base_dir):
+        return None
+    if interview_type not in {entry.name for entry in os.scandir(base_dir) if entry.is_dir()}:
+        return None
+    return os.path.join(base_dir, interview_type)
+
+def lexicon_signature(interview_type: str, base_dir: str = None):
+    """(file, mtime, size) of a type's lexicon files: changes whenever one is edited, added or removed."""
+    folder = lexicon_folder(interview_type, base_dir)
+    if folder is None:
+        return ()
+    return tuple(sorted(
+        (entry.name, entry.stat().st_mtime_ns, entry.stat().st_size)
+        for entry in os.scandir(folder) if entry.name.endswith(".txt")
+    ))
+
+def load_lexicon_files(interview_type: str, base_dir: str = None):
+    """Reads LEXICON_DIR/<interview_type>/*.txt into {category: [terms]}."""
+    folder = lexicon_folder(interview_type, base_dir)
+    if folder is None:
+        return {}
+
+    lexicons = {}
+    for file_name in sorted(os.listdir(folder)):
+        category, ext = os.path.splitext(file_name)
+        if ext != ".txt":
+            continue
+        with open(os.path.join(folder, file_name), encoding="utf-8") as f:
+            lexicons[category] = [
+                line.split("#", 1)[0].strip() for line in f
+                if line.split("#", 1)[0].strip()
+            ]
+    return lexicons
+
+def merge_lexicons(defaults: dict, extra: dict):
+    merged = {category: set(terms) for category, terms in defaults.items()}
+    for category, terms in extra.items():
+        merged.setdefault(category, set()).update(terms)
+    return merged
+
+def lexicon_fingerprint(lexicons: dict):
+    """Short stable hash of a lexicon set, used to version cached analyses."""
+    canonical = "\n".join(
+        f"{category}:{'|'.join(sorted(t.lower() for t in terms))}"
+        for category, terms in sorted(lexicons.items())
+    )
+    return hashlib.sha1(canonical.encode("utf-8")).hexdigest()[:12]
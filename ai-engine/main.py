@@ -1,10 +1,12 @@
 import os
+import json
 from uuid import uuid4
-from fastapi import FastAPI, UploadFile, File, BackgroundTasks, HTTPException, Form
+from fastapi import FastAPI, UploadFile, File, HTTPException, Form, Header
+from fastapi.responses import StreamingResponse, PlainTextResponse, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
-import whisper
+from pymongo.errors import ConnectionFailure, ExecutionTimeout
 
 
 # Your custom modules
@@ -13,10 +15,20 @@ from database import (
     delete_interview, 
     update_interview, 
     get_all_interviews,
-    update_interview_status,
+    list_interviews,
+    ensure_interview_indexes,
     reports_collection # 🔥 Import collection for direct lookup
 )
-from video_processor import process_video
+from job_queue import enqueue_job, cancel_jobs, has_capacity, ensure_job_indexes, job_status_counts, QueueFullError
+from result_cache import ensure_cache_indexes, get_cache_stats
+from model_registry import model_stats
+from metrics import render_prometheus
+from progress_events import iter_events, ensure_event_indexes
+from emotion_summary import downsample_timeline, slice_timeline, timeline_from_legacy
+from report_payloads import ensure_payload_indexes, hydrate_reports, get_transcript_range, delete_payloads
+from transcript_index import get_context_segments, invalidate_transcript
+from upload_handler import save_upload, remove_upload, UploadLimitMiddleware, UploadTooLargeError, MAX_UPLOAD_BYTES
+from async_db import run_db, close_db, DatabaseTimeoutError
 
 app = FastAPI()
 
@@ -25,6 +37,10 @@ if not os.path.exists("videos"):
     os.makedirs("videos")
 app.mount("/videos", StaticFiles(directory="videos"), name="videos")
 
+# Oversized videos are refused from their headers, before the body is read
+# (added first so CORS still wraps the 413)
+app.add_middleware(UploadLimitMiddleware, paths=["/analyze-video"])
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"], 
@@ -33,8 +49,27 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# 2. Load Model Once
-model = whisper.load_model("base")
+@app.on_event("startup")
+def setup_job_queue():
+    ensure_interview_indexes()
+    ensure_job_indexes()
+    ensure_cache_indexes()
+    ensure_event_indexes()
+    ensure_payload_indexes()
+
+@app.on_event("shutdown")
+def close_database():
+    close_db()
+
+# Mongo unreachable or too slow: tell the client to retry instead of a bare 500
+@app.exception_handler(DatabaseTimeoutError)
+@app.exception_handler(ConnectionFailure)
+@app.exception_handler(ExecutionTimeout)
+async def database_unavailable(request, exc):
+    print(f"❌ Database Unavailable: {exc}")
+    return JSONResponse(status_code=503, content={"detail": "Database temporarily unavailable, please retry"})
+
+# 2. No ML models are loaded here: workers load them lazily via model_registry
 
 class InterviewUpdate(BaseModel):
     title: str = None
@@ -49,82 +84,221 @@ def home():
 
 @app.post("/analyze-video")
 async def analyze_video_route(
-    background_tasks: BackgroundTasks, 
     video: UploadFile = File(...),
     title: str = Form(...),
     interview_type: str = Form(...)
 ):
+    # 🚦 Backpressure: turn uploads away before writing them when workers are saturated
+    if not await run_db(has_capacity):
+        raise HTTPException(status_code=503, detail="Analysis queue is full, please retry shortly")
+
     interview_id = str(uuid4()) 
     unique_name = f"{interview_id}_{video.filename}"
     video_location = os.path.join("videos", unique_name)
 
-    with open(video_location, "wb") as buffer:
-        buffer.write(await video.read())
+    # 🔥 Copied to disk in chunks; the SHA-256 doubles as a content key for later stages
+    try:
+        content_hash, size_bytes = await save_upload(video, video_location)
+    except UploadTooLargeError:
+        raise HTTPException(status_code=413, detail=f"Video exceeds the {MAX_UPLOAD_BYTES // (1024 * 1024)} MB upload limit")
 
     initial_report = {
-        "status": "Transcribing...", 
+        "status": "Queued...", 
         "duration": "Calculating...",
         "transcript": "",
         "qa_analysis": [],
         "emotion_analysis": {}
     }
-    save_interview(video_location, initial_report, title=title, interview_type=interview_type, interview_id=interview_id)
+    await run_db(
+        save_interview, video_location, initial_report, title=title, interview_type=interview_type, interview_id=interview_id,
+        content_hash=content_hash, size_bytes=size_bytes
+    )
 
-    def run_pipeline(path, id):
-        try:
-            report = process_video(path, id) 
-            update_interview(id, {
-                **report,
-                "status": "Completed"
-            })
-        except Exception as e:
-            print(f"Pipeline Error: {e}")
-            update_interview_status(id, "Error in Analysis")
-
-    background_tasks.add_task(run_pipeline, video_location, interview_id)
+    # 🔥 The pipeline runs in worker.py processes, not inside the API
+    try:
+        await run_db(enqueue_job, interview_id, video_location, content_hash, interview_type)
+    except QueueFullError:
+        await run_db(delete_interview, interview_id)
+        if os.path.exists(video_location):
+            os.remove(video_location)
+        raise HTTPException(status_code=503, detail="Analysis queue is full, please retry shortly")
     
     return {
         "message": "Processing started", 
         "interview_id": interview_id,
-        "status": "Transcribing..."
+        "status": "Queued..."
     }
 
+@app.get("/models")
+def fetch_model_stats():
+    """Which models this API process has loaded (normally none), with load times."""
+    return {"data": model_stats()}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def fetch_metrics():
+    """📊 Prometheus scrape endpoint: stage latency histograms, job counters, queue depth, model load times."""
+    return PlainTextResponse(render_prometheus(job_status_counts()), media_type="text/plain; version=0.0.4")
+
+@app.get("/cache/stats")
+def fetch_cache_stats():
+    """Result-cache hit/miss counters per pipeline stage."""
+    return {"data": get_cache_stats()}
+
+@app.get("/rescore")
+def fetch_rescore_status():
+    """🔁 Progress of the bulk re-scoring run and how many reports are still stale."""
+    # Imported here: computing the target versions reads the lexicons (spaCy import, no model load)
+    from rescore import rescore_status
+    return {"data": rescore_status()}
+
+@app.post("/rescore")
+def start_rescore(restart: bool = False):
+    """Re-scores stale reports from their stored transcripts/emotions in a background process."""
+    from rescore import rescore_status, launch_rescore
+    status = rescore_status()
+    if status["running"]:
+        raise HTTPException(status_code=409, detail="A re-scoring run is already in progress")
+    launch_rescore(restart)
+    return {"message": "Re-scoring started", "stale": status["stale"]}
+
 @app.get("/interviews")
-def fetch_interviews():
+def fetch_interviews(
+    limit: int = None,
+    cursor: str = None,
+    interview_type: str = None,
+    status: str = None,
+    view: str = None
+):
+    """
+    Without paging params this is the legacy full listing. With `limit`/`cursor`
+    (or view=summary) it returns projected summary fields, one page at a time;
+    view=full pages through complete reports instead.
+    """
+    if limit or cursor or interview_type or status or view == "summary":
+        summary = view != "full"
+        try:
+            items, next_cursor = list_interviews(
+                limit=limit or 20, cursor=cursor, interview_type=interview_type,
+                status=status, summary=summary
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if not summary:
+            hydrate_reports(items)
+        return {"data": items, "next_cursor": next_cursor}
+
+    # Legacy full view (every payload decompressed); the dashboard pages through view=summary
     interviews = []
     for item in get_all_interviews(): 
         item["_id"] = str(item["_id"])
         interviews.append(item)
-    return {"data": interviews}
+    return {"data": hydrate_reports(interviews)}
 
 # 🔥 NEW: Public Share / Single Interview Fetch Route
 @app.get("/interview/{interview_id}")
-async def fetch_single_interview(interview_id: str):
-    """Fetches a single interview by its UUID for sharing or deep linking."""
-    interview = reports_collection.find_one({"interview_id": interview_id})
+async def fetch_single_interview(interview_id: str, view: str = "full"):
+    """
+    Fetches a single interview by its UUID for sharing or deep linking.
+    view=summary skips the offloaded payloads (transcript, full Q&A, per-second emotions).
+    """
+    interview = await run_db(reports_collection.find_one, {"interview_id": interview_id})
     if not interview:
         raise HTTPException(status_code=404, detail="Interview report not found")
     
     # Convert MongoDB ObjectId to string for JSON compatibility
     interview["_id"] = str(interview["_id"])
+    if view != "summary":
+        await run_db(hydrate_reports, [interview])
     return {"data": interview}
 
+@app.get("/interview/{interview_id}/transcript")
+async def fetch_transcript_range(interview_id: str, start: float = None, end: float = None):
+    """Transcript segments overlapping [start, end] seconds (the whole transcript without a range)."""
+    segments = await run_db(get_transcript_range, interview_id, start, end)
+    if segments is None:
+        raise HTTPException(status_code=404, detail="Interview report not found")
+    return {"data": segments}
+
+@app.get("/interview/{interview_id}/timeline")
+async def fetch_emotion_timeline(interview_id: str, resolution: float = 1, start: float = None, end: float = None):
+    """
+    Compact emotion timeline (label codes + run lengths), optionally cut to [start, end)
+    seconds and downsampled to `resolution` seconds.
+    """
+    interview = await run_db(
+        reports_collection.find_one,
+        {"interview_id": interview_id},
+        {"emotions.emotion_timeline": 1, "emotions.emotion_percentages": 1, "payloads.emotion_timeline": 1}
+    )
+    if not interview:
+        raise HTTPException(status_code=404, detail="Interview report not found")
+    # Long timelines keep only labels/resolution inline; the runs are in the payload store
+    await run_db(hydrate_reports, [interview], ["emotion_timeline"])
+
+    emotions = interview.get("emotions") or {}
+    timeline = emotions.get("emotion_timeline") or timeline_from_legacy(emotions.get("emotion_percentages") or {})
+    if start is not None or end is not None:
+        timeline = slice_timeline(timeline, start, end)
+    return {"data": downsample_timeline(timeline, max(resolution, timeline["resolution"]))}
+
+@app.get("/interview/{interview_id}/events")
+async def stream_interview_events(interview_id: str, last_event_id: str = Header(None)):
+    """
+    📡 Server-Sent Events: stage transitions, percent progress within long stages and
+    a final completed/failed event, pushed as the worker publishes them.
+    """
+    interview = await run_db(reports_collection.find_one, {"interview_id": interview_id}, {"status": 1})
+    if not interview:
+        raise HTTPException(status_code=404, detail="Interview report not found")
+
+    def sse(event, data, event_id=None):
+        head = f"id: {event_id}\n" if event_id else ""
+        return f"{head}event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+    async def event_source():
+        status = interview.get("status")
+        # Already finished (its events may have expired): answer once and close.
+        # "Error..." is only written once the worker gives up, so a retrying job keeps streaming.
+        if status == "Completed" or (status or "").startswith("Error"):
+            yield sse("completed" if status == "Completed" else "failed", {"status": status})
+            return
+
+        yield sse("stage", {"status": status})
+        async for doc in iter_events(interview_id, last_event_id):
+            if doc is None:
+                yield ": keep-alive\n\n"
+                continue
+            yield sse(doc["event"], doc["data"], str(doc["_id"]))
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.put("/interview/{interview_id}")
 async def edit_interview(interview_id: str, payload: InterviewUpdate):
     update_data = {k: v for k, v in payload.dict().items() if v is not None}
     if not update_data:
         raise HTTPException(status_code=400, detail="No data provided to update")
 
-    success = update_interview(interview_id, update_data)
+    success = await run_db(update_interview, interview_id, update_data)
     if not success:
         raise HTTPException(status_code=404, detail="Interview not found")
+    invalidate_transcript(interview_id)
     return {"message": "Updated successfully"}
 
 @app.delete("/interview/{interview_id}")
 def remove_interview(interview_id: str):
+    saved = reports_collection.find_one({"interview_id": interview_id}, {"video_path": 1})
     success = delete_interview(interview_id)
     if not success:
         raise HTTPException(status_code=404, detail="Not found")
+    # Otherwise a queued or leased job would still run and write to the deleted report
+    cancel_jobs(interview_id)
+    delete_payloads(interview_id)
+    invalidate_transcript(interview_id)
+    remove_upload((saved or {}).get("video_path"))
     return {"message": "Deleted successfully"}
 
 
@@ -134,21 +308,17 @@ class ChatRequest(BaseModel):
     interview_id: str
     query: str
     timestamp: float
+    window: float = None  # Seconds of context either side; defaults to MENTOR_CONTEXT_WINDOW
 
 @app.post("/mentor/chat")
 async def mentor_chat(req: ChatRequest):
-    # 1. Fetch the specific interview data
-    report = reports_collection.find_one({"interview_id": req.interview_id})
-    if not report:
+    # 1. Segments around the current timestamp, from the cached time index
+    segments = await run_db(get_context_segments, req.interview_id, req.timestamp, req.window)
+    if segments is None:
         raise HTTPException(status_code=404, detail="Interview session not found")
 
     # 2. Extract Transcript Context
-    # We look for segments within a 15-second window of the current timestamp
-    transcript = report.get("transcript", [])
-    relevant_segments = [
-        seg["text"] for seg in transcript 
-        if abs(seg["start"] - req.timestamp) < 15
-    ]
+    relevant_segments = [seg["text"] for seg in segments]
     context_text = " ".join(relevant_segments)
 
     # 3. Simulate NexusMind RAG Logic
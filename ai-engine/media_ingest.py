@@ -0,0 +1,247 @@
+import os
+import tempfile
+import threading
+from itertools import chain
+from collections import deque
+import cv2
+import numpy as np
+from audio_extractor import WHISPER_SAMPLE_RATE
+
+try:
+    import av  # PyAV: optional, enables the single-demux ingest
+except ImportError:
+    av = None
+
+# 📼 Single-pass ingest: the container is demuxed once and its packets fanned out to
+# every consumer (metadata, thumbnail, 1 fps frame sampler, 16 kHz audio decoder),
+# so each upload is read from the (network-mounted) video store once instead of three times.
+MEDIA_SINGLE_DEMUX = os.getenv("MEDIA_SINGLE_DEMUX", "true").lower() == "true"
+# Compressed video held in memory ahead of the frame consumer. Past it, packets spill to a
+# temp file while audio() still waits on the demux (so transcription never waits on the
+# emotion stage); once nobody waits on the audio, the demux blocks instead.
+MEDIA_PACKET_BUFFER_MB = float(os.getenv("MEDIA_PACKET_BUFFER_MB", "64"))
+
+_END = object()
+
+class MediaIngest:
+    """
+    One demux of an upload shared by the pipeline branches. Metadata is read from the
+    container header on open. A background thread demuxes the file, decodes the audio and
+    hands the compressed video packets to frames(), which decodes them in the consumer's
+    thread: a slow frame consumer never holds up audio().
+
+    Each consumer kind ("frames", "audio") must either be consumed (frames() / audio())
+    or release()d, because the demux only starts once it knows which streams to decode.
+    """
+
+    KINDS = ("frames", "audio")
+
+    def __init__(self, video_path, every_seconds=1):
+        self.video_path = video_path
+        self.container = av.open(video_path)
+        self.video_stream = self.container.streams.video[0] if self.container.streams.video else None
+        self.audio_stream = self.container.streams.audio[0] if self.container.streams.audio else None
+
+        rate = self.video_stream.average_rate if self.video_stream else None
+        self.fps = float(rate) if rate else 30  # Same fallback as the OpenCV readers
+        if self.container.duration:
+            self.duration_seconds = self.container.duration / av.time_base
+        elif self.video_stream and self.video_stream.duration:
+            self.duration_seconds = float(self.video_stream.duration * self.video_stream.time_base)
+        else:
+            self.duration_seconds = 0
+        self.frame_count = (self.video_stream.frames if self.video_stream else 0) or int(self.duration_seconds * self.fps)
+        self.interval = max(int(self.fps * every_seconds), 1)
+        self.thumbnail_path = video_path.rsplit(".", 1)[0] + "_thumb.jpg"
+
+        self._wanted = {}
+        self._closed = set()
+        self._cond = threading.Condition()
+        self._packets = deque()
+        self._buffered_bytes = 0
+        self._spill_path = None
+        self._spill_writer = None
+        self._spill_reader = None
+        self._audio = None
+        self._audio_done = threading.Event()
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name="media-demux", daemon=True)
+        self._thread.start()
+
+    # --- consumer side ---
+
+    def _resolve(self, kind, wanted):
+        with self._cond:
+            self._wanted.setdefault(kind, wanted)
+            if not wanted:
+                self._closed.add(kind)
+                if kind == "frames":
+                    self._packets.clear()  # Nobody will decode them
+                    self._buffered_bytes = 0
+            self._cond.notify_all()
+
+    def release(self, kind):
+        """Tells the demux a consumer doesn't need (or no longer reads) this stream."""
+        self._resolve(kind, False)
+
+    def _next_packets(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._packets)
+                packet = self._packets.popleft()
+                if packet is _END:
+                    return
+                if not isinstance(packet, tuple):
+                    self._buffered_bytes -= packet.size
+                self._cond.notify_all()
+            yield self._read_spilled(packet) if isinstance(packet, tuple) else packet
+
+    def frames(self):
+        """Yields (timestamp, BGR ndarray) samples on the same grid as iter_sampled_frames."""
+        self._resolve("frames", True)
+        try:
+            count = 0
+            decoder = self.video_stream.codec_context if self.video_stream else None
+            # The trailing None flushes the frames the decoder holds back for reordering
+            for packet in chain(self._next_packets(), [None]) if decoder is not None else ():
+                for frame in decoder.decode(packet):
+                    if count % self.interval == 0:
+                        yield count / self.fps, frame.to_ndarray(format="bgr24")
+                    count += 1
+            if self._error is not None:
+                raise self._error
+        finally:
+            self.release("frames")
+
+    def audio(self):
+        """Blocks until the demux has read the whole file; returns the mono 16 kHz float32 waveform, or None."""
+        self._resolve("audio", True)
+        self._audio_done.wait()
+        self.release("audio")
+        return self._audio
+
+    def close(self):
+        for kind in self.KINDS:
+            self.release(kind)
+        self._thread.join()
+        # Closed here, not by the demux: frames() may still be decoding buffered packets
+        self.container.close()
+        if self._spill_path is not None:
+            self._spill_writer.close()
+            self._spill_reader.close()
+            os.remove(self._spill_path)
+
+    # --- demux side ---
+
+    def _wants(self, kind):
+        return self._wanted.get(kind) and kind not in self._closed
+
+    def _put_packet(self, packet):
+        limit = MEDIA_PACKET_BUFFER_MB * 2**20
+        with self._cond:
+            # Only backpressure once no audio consumer is waiting on the demux
+            self._cond.wait_for(lambda: (
+                "frames" in self._closed or self._wants("audio")
+                or not self._packets or self._buffered_bytes + packet.size <= limit
+            ))
+            if "frames" in self._closed:
+                return
+            spill = self._buffered_bytes + packet.size > limit
+            if not spill:
+                self._packets.append(packet)
+                self._buffered_bytes += packet.size
+                self._cond.notify_all()
+        if spill:
+            self._spill(packet)
+
+    def _spill(self, packet):
+        """Appends the packet to the spill file; the queue only keeps its timing fields."""
+        if self._spill_path is None:
+            fd, self._spill_path = tempfile.mkstemp(prefix="media_packets_", suffix=".bin")
+            os.close(fd)
+            self._spill_writer = open(self._spill_path, "wb")
+            self._spill_reader = open(self._spill_path, "rb")
+        self._spill_writer.write(bytes(packet))
+        self._spill_writer.flush()
+        with self._cond:
+            # Written before it is queued: the reader never gets ahead of the file
+            self._packets.append((packet.size, packet.pts, packet.dts, packet.time_base))
+            self._cond.notify_all()
+
+    def _read_spilled(self, entry):
+        # Spilled packets are read back in the order they were written. Allocated by size so
+        # FFmpeg zeroes the input padding its decoders read past the end (Packet(bytes) doesn't)
+        size, pts, dts, time_base = entry
+        packet = av.Packet(size)
+        self._spill_reader.readinto(memoryview(packet))
+        packet.pts, packet.dts, packet.time_base = pts, dts, time_base
+        return packet
+
+    def _end_packets(self):
+        with self._cond:
+            self._packets.append(_END)
+            self._cond.notify_all()
+
+    def _write_thumbnail(self, decoder, packet):
+        """Decodes the first frame with a private decoder, leaving the stream's one to frames()."""
+        for frame in decoder.decode(packet):
+            cv2.imwrite(self.thumbnail_path, frame.to_ndarray(format="bgr24"))
+            return True
+        return False
+
+    def _run(self):
+        audio_chunks = []
+        try:
+            with self._cond:
+                self._cond.wait_for(lambda: all(k in self._wanted for k in self.KINDS))
+
+            decode_audio = self.audio_stream is not None and self._wanted.get("audio")
+            resampler = av.AudioResampler(format="s16", layout="mono", rate=WHISPER_SAMPLE_RATE) if decode_audio else None
+            streams = [s for s in (self.video_stream, self.audio_stream if decode_audio else None) if s is not None]
+
+            thumbnail = None
+            if self.video_stream is not None:
+                thumbnail = av.CodecContext.create(self.video_stream.codec_context.name, "r")
+                thumbnail.extradata = self.video_stream.codec_context.extradata
+
+            for packet in self.container.demux(*streams):
+                if packet.stream.type == "video":
+                    if packet.size == 0:
+                        continue  # Demuxer flush packet; frames() flushes its own decoder
+                    if thumbnail is not None and self._write_thumbnail(thumbnail, packet):
+                        thumbnail = None
+                    if self._wants("frames"):
+                        self._put_packet(packet)
+                    elif thumbnail is None and not self._wants("audio"):
+                        break
+                elif packet.stream.type == "audio" and self._wants("audio"):
+                    for frame in packet.decode():
+                        audio_chunks.extend(self._resample(resampler, frame))
+
+            if resampler is not None:
+                audio_chunks.extend(self._resample(resampler, None))  # Flush
+            if decode_audio and audio_chunks:
+                self._audio = np.concatenate(audio_chunks).astype(np.float32) / 32768.0
+        except Exception as e:
+            print(f"❌ Media Demux Error: {e}")
+            self._error = e
+        finally:
+            self._audio_done.set()
+            self._end_packets()
+
+    @staticmethod
+    def _resample(resampler, frame):
+        out = resampler.resample(frame)
+        # PyAV >= 9 returns a list of frames, older versions a single frame (or None)
+        frames = out if isinstance(out, list) else [out] if out is not None else []
+        return [f.to_ndarray().reshape(-1) for f in frames]
+
+def open_media(video_path, every_seconds=1):
+    """A MediaIngest for `video_path`, or None to use the separate OpenCV/ffmpeg readers."""
+    if av is None or not MEDIA_SINGLE_DEMUX:
+        return None
+    try:
+        return MediaIngest(video_path, every_seconds=every_seconds)
+    except Exception as e:
+        print(f"⚠️ Single-demux ingest unavailable, falling back: {e}")
+        return None
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from database import reports_collection
+from transcript_index import get_context_segments
+from async_db import run_db
 
 router = APIRouter()
 
@@ -8,20 +9,17 @@ class ChatRequest(BaseModel):
     interview_id: str
     query: str
     timestamp: float
+    window: float = None  # Seconds of context either side; defaults to MENTOR_CONTEXT_WINDOW
 
 @router.post("/mentor/chat")
 async def mentor_chat(req: ChatRequest):
-    # 1. Fetch the specific interview data
-    report = reports_collection.find_one({"interview_id": req.interview_id})
-    if not report:
+    # 1. Segments around the timestamp, from the cached time index
+    segments = await run_db(get_context_segments, req.interview_id, req.timestamp, req.window)
+    if segments is None:
         raise HTTPException(status_code=404, detail="Report not found")
 
-    # 2. Extract context around the timestamp (e.g., +/- 10 seconds)
-    transcript = report.get("transcript", [])
-    relevant_text = " ".join([
-        seg["text"] for seg in transcript 
-        if abs(seg["start"] - req.timestamp) < 15
-    ])
+    # 2. Extract context around the timestamp
+    relevant_text = " ".join([seg["text"] for seg in segments])
 
     # 3. NexusMind Integration (Simulated Logic)
     # This is where Jarvis would query your knowledge graph for study resources
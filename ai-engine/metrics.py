@@ -0,0 +1,209 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pymongo.errors import PyMongoError
+from database import db, reports_collection
+
+# 📊 Pipeline instrumentation. Workers time every stage (and track the process' peak
+# resident memory while it runs), store the breakdown on the interview and fold it into
+# aggregated counters in Mongo, which the API renders in Prometheus text format at /metrics.
+metrics_collection = db["pipeline_metrics"]
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+# How often the memory sampler reads RSS while stages are running
+METRICS_SAMPLE_SECONDS = float(os.getenv("METRICS_SAMPLE_SECONDS", "0.25"))
+# Stage latency histogram buckets, in seconds
+STAGE_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+def current_rss_bytes():
+    """Resident memory of this process right now (psutil, /proc, or the peak as a last resort)."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except ImportError:
+        return None
+
+class PipelineMetrics:
+    """
+    Per-interview stage timings. `stage(name)` can be entered many times (e.g. once per
+    FER batch) and from concurrent branches; time accumulates per stage, and the peak
+    is the highest process RSS sampled while that stage was active.
+    """
+
+    def __init__(self, interview_id):
+        self.interview_id = interview_id
+        self.stages = {}
+        self.failed = set()
+        self._active = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler = None
+        if METRICS_ENABLED:
+            self._sampler = threading.Thread(target=self._sample, name="metrics-sampler", daemon=True)
+            self._sampler.start()
+
+    def _sample(self):
+        while not self._stop.wait(METRICS_SAMPLE_SECONDS):
+            self._note_rss()
+
+    def _note_rss(self):
+        rss = current_rss_bytes()
+        if rss is None:
+            return
+        with self._lock:
+            for name in self._active:
+                entry = self.stages[name]
+                entry["peak_rss_bytes"] = max(entry["peak_rss_bytes"] or 0, rss)
+
+    @contextmanager
+    def stage(self, name):
+        with self._lock:
+            self.stages.setdefault(name, {"seconds": 0.0, "calls": 0, "peak_rss_bytes": None})
+            self._active[name] = self._active.get(name, 0) + 1
+        self._note_rss()
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.failed.add(name)
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            self._note_rss()
+            with self._lock:
+                self.stages[name]["seconds"] += elapsed
+                self.stages[name]["calls"] += 1
+                self._active[name] -= 1
+                if not self._active[name]:
+                    del self._active[name]
+
+    def timed_iter(self, name, iterable):
+        """Charges the time spent producing each item (e.g. decoding frames) to `name`."""
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def breakdown(self):
+        with self._lock:
+            return {
+                name: {
+                    "seconds": round(entry["seconds"], 3),
+                    "calls": entry["calls"],
+                    "peak_rss_mb": round(entry["peak_rss_bytes"] / 2**20, 1) if entry["peak_rss_bytes"] else None,
+                    "ok": name not in self.failed
+                }
+                for name, entry in self.stages.items()
+            }
+
+    def flush(self):
+        """Stores the breakdown on the interview and adds it to the aggregated histograms."""
+        self._stop.set()
+        if not METRICS_ENABLED:
+            return
+        breakdown = self.breakdown()
+        try:
+            reports_collection.update_one(
+                {"interview_id": self.interview_id},
+                {"$set": {"stage_metrics": breakdown}}
+            )
+            for name, entry in breakdown.items():
+                record_stage(name, entry["seconds"], self.stages[name]["peak_rss_bytes"], entry["ok"])
+        except PyMongoError as e:
+            print(f"❌ Metrics Write Error: {e}")
+
+def record_stage(stage, seconds, peak_rss_bytes=None, ok=True):
+    bucket = next((i for i, bound in enumerate(STAGE_BUCKETS) if seconds <= bound), len(STAGE_BUCKETS))
+    update = {"$inc": {"count": 1, "sum": seconds, f"buckets.{bucket}": 1}}
+    if not ok:
+        update["$inc"]["failures"] = 1
+    if peak_rss_bytes:
+        update["$max"] = {"peak_rss_bytes": peak_rss_bytes}
+    metrics_collection.update_one({"_id": f"stage:{stage}"}, update, upsert=True)
+
+def record_job(outcome):
+    """outcome: completed | retried | failed."""
+    try:
+        metrics_collection.update_one({"_id": "jobs"}, {"$inc": {outcome: 1}}, upsert=True)
+    except PyMongoError as e:
+        print(f"❌ Metrics Write Error: {e}")
+
+def record_model_loads(stats):
+    """Publishes model_registry.model_stats() from a worker (last load time per model)."""
+    loaded = {name: s for name, s in stats.items() if s.get("loaded") and s.get("load_seconds") is not None}
+    if not loaded:
+        return
+    try:
+        metrics_collection.update_one(
+            {"_id": "models"},
+            {"$set": {
+                **{f"{name}.load_seconds": s["load_seconds"] for name, s in loaded.items()},
+                **{f"{name}.memory_bytes": s.get("memory_bytes") for name, s in loaded.items()},
+                "updated_at": datetime.now(timezone.utc)
+            }},
+            upsert=True
+        )
+    except PyMongoError as e:
+        print(f"❌ Metrics Write Error: {e}")
+
+def _line(name, value, **labels):
+    label_text = ",".join(f'{k}="{v}"' for k, v in labels.items())
+    return f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}"
+
+def render_prometheus(job_counts=None):
+    """Aggregated metrics in Prometheus text exposition format (version 0.0.4)."""
+    docs = {doc["_id"]: doc for doc in metrics_collection.find()}
+    lines = [
+        "# HELP pipeline_stage_seconds Time spent in each pipeline stage per interview.",
+        "# TYPE pipeline_stage_seconds histogram",
+    ]
+    stage_docs = sorted((k.split(":", 1)[1], v) for k, v in docs.items() if k.startswith("stage:"))
+    for stage, doc in stage_docs:
+        buckets = doc.get("buckets") or {}
+        cumulative = 0
+        for i, bound in enumerate(STAGE_BUCKETS):
+            cumulative += buckets.get(str(i), 0)
+            lines.append(_line("pipeline_stage_seconds_bucket", cumulative, stage=stage, le=bound))
+        lines.append(_line("pipeline_stage_seconds_bucket", doc.get("count", 0), stage=stage, le="+Inf"))
+        lines.append(_line("pipeline_stage_seconds_sum", round(doc.get("sum", 0), 3), stage=stage))
+        lines.append(_line("pipeline_stage_seconds_count", doc.get("count", 0), stage=stage))
+
+    lines += ["# HELP pipeline_stage_failures_total Stage runs that raised.", "# TYPE pipeline_stage_failures_total counter"]
+    lines += [_line("pipeline_stage_failures_total", doc.get("failures", 0), stage=stage) for stage, doc in stage_docs]
+
+    lines += ["# HELP pipeline_stage_peak_rss_bytes Highest worker RSS seen while a stage ran.", "# TYPE pipeline_stage_peak_rss_bytes gauge"]
+    lines += [_line("pipeline_stage_peak_rss_bytes", doc["peak_rss_bytes"], stage=stage) for stage, doc in stage_docs if doc.get("peak_rss_bytes")]
+
+    jobs = docs.get("jobs") or {}
+    lines += ["# HELP pipeline_jobs_total Finished job attempts by outcome.", "# TYPE pipeline_jobs_total counter"]
+    lines += [_line("pipeline_jobs_total", jobs.get(outcome, 0), outcome=outcome) for outcome in ("completed", "retried", "failed")]
+
+    if job_counts is not None:
+        lines += ["# HELP pipeline_queue_depth Jobs waiting for a worker.", "# TYPE pipeline_queue_depth gauge"]
+        lines.append(_line("pipeline_queue_depth", job_counts.get("queued", 0)))
+        lines += ["# HELP pipeline_jobs_in_flight Jobs currently leased by a worker.", "# TYPE pipeline_jobs_in_flight gauge"]
+        lines.append(_line("pipeline_jobs_in_flight", job_counts.get("running", 0)))
+
+    models = {k: v for k, v in (docs.get("models") or {}).items() if isinstance(v, dict)}
+    lines += ["# HELP pipeline_model_load_seconds Last model load time reported by a worker.", "# TYPE pipeline_model_load_seconds gauge"]
+    lines += [_line("pipeline_model_load_seconds", s["load_seconds"], model=name) for name, s in sorted(models.items())]
+    lines += ["# HELP pipeline_model_memory_bytes Approximate resident memory added by loading a model.", "# TYPE pipeline_model_memory_bytes gauge"]
+    lines += [_line("pipeline_model_memory_bytes", s["memory_bytes"], model=name) for name, s in sorted(models.items()) if s.get("memory_bytes")]
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,130 @@
+import os
+import time
+import atexit
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# 🧠 Central model registry: every ML model is loaded at most once per process,
+# on first use. Importing this module (or the API) loads nothing.
+
+WHISPER_MODEL_NAME = os.getenv("WHISPER_MODEL", "base")
+SPACY_MODEL_NAME = os.getenv("SPACY_MODEL", "en_core_web_sm")
+
+# Models worker processes load up front instead of on their first job
+WARMUP_MODELS = [m for m in os.getenv("WARMUP_MODELS", "whisper,spacy,fer").split(",") if m]
+
+def torch_device():
+    """'cuda' when an NVIDIA GPU is available, else 'cpu'."""
+    import torch
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+def _load_whisper():
+    import whisper
+    device = torch_device()
+    print(f"Loading Whisper model on {device}...")
+    return whisper.load_model(WHISPER_MODEL_NAME, device=device)
+
+def _load_spacy():
+    import spacy
+    return spacy.load(SPACY_MODEL_NAME)
+
+def _load_fer():
+    from fer.fer import FER
+    return FER(mtcnn=True) # mtcnn=True is slower but MUCH more accurate
+
+_LOADERS = {
+    "whisper": _load_whisper,
+    "spacy": _load_spacy,
+    "fer": _load_fer,
+}
+
+_models = {}
+_stats = {}
+_locks = {name: threading.Lock() for name in _LOADERS}
+
+def _rss_bytes():
+    """Current resident memory of this process, or None if it can't be measured."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        import resource
+        # ru_maxrss is the peak, in KB on Linux; good enough for a load delta
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except ImportError:
+        return None
+
+def get_model(name: str):
+    """Returns the shared instance of `name`, loading it on first use."""
+    model = _models.get(name)
+    if model is not None:
+        return model
+
+    if name not in _LOADERS:
+        raise KeyError(f"Unknown model '{name}'")
+
+    # Per-model lock: concurrent pipeline branches must not load the same model twice
+    with _locks[name]:
+        if name not in _models:
+            rss_before = _rss_bytes()
+            started = time.perf_counter()
+            _models[name] = _LOADERS[name]()
+            rss_after = _rss_bytes()
+
+            _stats[name] = {
+                "load_seconds": round(time.perf_counter() - started, 3),
+                "memory_bytes": (rss_after - rss_before) if rss_before is not None and rss_after is not None else None,
+                "pid": os.getpid()
+            }
+            print(f"✅ Loaded {name} in {_stats[name]['load_seconds']}s")
+    return _models[name]
+
+def warm_up(names=None):
+    """Eagerly loads models (e.g. when a worker starts) so the first job doesn't pay for it."""
+    for name in names or WARMUP_MODELS:
+        get_model(name.strip())
+
+def model_stats():
+    """Load time and approximate memory per model loaded in this process."""
+    return {
+        name: {**_stats.get(name, {}), "loaded": name in _models}
+        for name in _LOADERS
+    }
+
+# Long-lived process pools for the sharded stages, one per name, reused across jobs
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_process_pool(name: str, workers: int):
+    """
+    Returns this process's spawn pool for `name`, creating it on first use. Pool workers
+    stay alive between jobs, so each loads its models (via get_model) only once.
+    """
+    with _pools_lock:
+        pool, size = _pools.get(name, (None, 0))
+        if pool is not None and size != workers:
+            pool.shutdown(wait=True)
+            pool = None
+        if pool is None:
+            # spawn: TensorFlow/PyTorch state is not fork-safe
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _pools[name] = (pool, workers)
+        return pool
+
+def discard_process_pool(name: str):
+    """Drops a broken pool (e.g. a worker was OOM-killed) so the next job starts a fresh one."""
+    with _pools_lock:
+        pool, _ = _pools.pop(name, (None, 0))
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+@atexit.register
+def shutdown_process_pools():
+    with _pools_lock:
+        pools = [pool for pool, _ in _pools.values()]
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown(wait=True, cancel_futures=True)
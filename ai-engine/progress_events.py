@@ -0,0 +1,172 @@
+import os
+import time
+import asyncio
+import threading
+from datetime import datetime, timezone
+from bson import ObjectId
+from pymongo import ASCENDING
+from pymongo.errors import PyMongoError
+from database import db, update_interview_status, get_interview
+from async_db import run_stream
+
+# 📡 Pipeline progress events. Workers (any process, any machine) insert small event
+# documents; the API streams them to clients over SSE instead of clients polling /interviews.
+events_collection = db["pipeline_events"]
+
+EVENT_TTL_SECONDS = int(os.getenv("EVENT_TTL_SECONDS", str(24 * 3600)))
+# Fallback tail interval when Mongo change streams aren't available (standalone server)
+EVENT_POLL_SECONDS = float(os.getenv("EVENT_POLL_SECONDS", "0.5"))
+EVENT_KEEPALIVE_SECONDS = float(os.getenv("EVENT_KEEPALIVE_SECONDS", "15"))
+# Percent-progress events are throttled to one per stage per interval
+PROGRESS_MIN_INTERVAL = float(os.getenv("PROGRESS_MIN_INTERVAL", "1"))
+
+TERMINAL_EVENTS = {"completed", "failed"}
+
+# Pipeline stages (keys of the report's `stages` map) and how they read in the UI
+STAGE_LABELS = {
+    "transcription": "Transcribing",
+    "qa_analysis": "Analyzing Q&A",
+    "emotions": "Analyzing Emotions",
+}
+
+_last_progress = {}
+# Branches of one interview run as threads of one worker process; deriving and writing
+# the combined status under a lock keeps a stale snapshot from overwriting a newer one
+_status_lock = threading.Lock()
+
+def ensure_event_indexes():
+    events_collection.create_index("created_at", expireAfterSeconds=EVENT_TTL_SECONDS)
+    events_collection.create_index([("interview_id", ASCENDING), ("_id", ASCENDING)])
+
+def publish_event(interview_id: str, event: str, **data):
+    try:
+        events_collection.insert_one({
+            "interview_id": interview_id,
+            "event": event,
+            "data": data,
+            "created_at": datetime.now(timezone.utc)
+        })
+    except PyMongoError as e:
+        print(f"❌ Event Publish Error: {e}")
+
+def report_stage(interview_id: str, status: str, duration: str = None):
+    """Stage transition: persists the status on the report and pushes it to subscribers."""
+    update_interview_status(interview_id, status, duration=duration)
+    data = {"status": status}
+    if duration:
+        data["duration"] = duration
+    publish_event(interview_id, "stage", **data)
+
+def stage_status(stages):
+    """Display status derived from the per-stage map: every stage running right now, in pipeline order."""
+    running = [
+        label for stage, label in STAGE_LABELS.items()
+        if ((stages or {}).get(stage) or {}).get("status") == "running"
+    ]
+    return " · ".join(running) + "..." if running else None
+
+def report_stages(interview_id: str):
+    """
+    Called after a branch updates its entry in `stages`: re-derives the combined status,
+    persists it and pushes it with the per-stage states, so concurrent branches never
+    overwrite each other's status.
+    """
+    with _status_lock:
+        saved = get_interview(interview_id, {"stages": 1}) or {}
+        stages = {name: (entry or {}).get("status") for name, entry in (saved.get("stages") or {}).items()}
+        status = stage_status(saved.get("stages"))
+        if status is None:
+            # Nothing running (done, or between attempts): the worker reports what comes next
+            return
+        update_interview_status(interview_id, status)
+        publish_event(interview_id, "stage", status=status, stages=stages)
+
+def report_progress(interview_id: str, stage: str, done, total):
+    """Percent progress within a long stage (frames analysed, audio seconds transcribed)."""
+    now = time.monotonic()
+    key = (interview_id, stage)
+    finished = total and done >= total
+    if not finished and now - _last_progress.get(key, 0) < PROGRESS_MIN_INTERVAL:
+        return
+    _last_progress[key] = now
+
+    percent = round(min(done / total, 1) * 100, 1) if total else None
+    publish_event(interview_id, "progress", stage=stage, done=done, total=total, percent=percent)
+
+def report_finished(interview_id: str, ok: bool, status: str = None):
+    for key in [k for k in _last_progress if k[0] == interview_id]:
+        _last_progress.pop(key, None)
+    publish_event(interview_id, "completed" if ok else "failed", status=status)
+
+def report_failed(interview_id: str):
+    """
+    Final give-up (no retry left): the only place an "Error..." status is written,
+    naming the stages that failed, followed by the terminal `failed` event.
+    """
+    saved = get_interview(interview_id, {"stages": 1}) or {}
+    failed = [name for name, entry in (saved.get("stages") or {}).items() if (entry or {}).get("status") == "failed"]
+    status = f"Error in Analysis ({', '.join(failed)})" if failed else "Error in Analysis"
+    update_interview_status(interview_id, status)
+    report_finished(interview_id, False, status)
+
+def progress_callback(interview_id: str, stage: str):
+    """Adapter for the (done, total) callbacks the analysis stages accept."""
+    return lambda done, total: report_progress(interview_id, stage, done, total)
+
+def _open_change_stream(interview_id: str):
+    try:
+        return events_collection.watch(
+            [{"$match": {"operationType": "insert", "fullDocument.interview_id": interview_id}}],
+            max_await_time_ms=int(EVENT_POLL_SECONDS * 1000)
+        )
+    except PyMongoError:
+        # Change streams need a replica set; fall back to tailing the indexed collection
+        return None
+
+def _events_after(interview_id: str, last_id):
+    query = {"interview_id": interview_id}
+    if last_id:
+        query["_id"] = {"$gt": last_id}
+    return list(events_collection.find(query).sort("_id", ASCENDING))
+
+async def iter_events(interview_id: str, last_event_id: str = None):
+    """
+    Yields event documents for one interview: first any backlog after `last_event_id`
+    (so reconnecting clients miss nothing), then live events until a terminal one.
+    Yields None as a keep-alive tick when nothing happened for a while.
+    """
+    last_id = ObjectId(last_event_id) if last_event_id and ObjectId.is_valid(last_event_id) else None
+    # Open the stream before reading the backlog so nothing falls in between
+    stream = await run_stream(_open_change_stream, interview_id)
+    pending = await run_stream(_events_after, interview_id, last_id)
+    idle_since = time.monotonic()
+
+    try:
+        while True:
+            if not pending:
+                if stream is not None:
+                    # Blocks up to EVENT_POLL_SECONDS server-side, on the SSE pool (not Starlette's shared one)
+                    change = await run_stream(stream.try_next)
+                    pending = [change["fullDocument"]] if change else []
+                else:
+                    pending = await run_stream(_events_after, interview_id, last_id)
+                    if not pending:
+                        await asyncio.sleep(EVENT_POLL_SECONDS)
+
+            for doc in pending:
+                # The backlog and the change stream can overlap by a few events
+                if last_id is not None and doc["_id"] <= last_id:
+                    continue
+                last_id = doc["_id"]
+                idle_since = time.monotonic()
+                yield doc
+                if doc["event"] in TERMINAL_EVENTS:
+                    return
+            pending = []
+
+            if time.monotonic() - idle_since >= EVENT_KEEPALIVE_SECONDS:
+                idle_since = time.monotonic()
+                yield None
+    finally:
+        if stream is not None:
+            stream.close()
@@ -1,7 +1,7 @@
-import spacy
+from model_registry import get_model
 
-# Load spaCy for sentence segmentation
-nlp = spacy.load("en_core_web_sm")
+# Bump whenever the question/answer splitting rules change
+QA_EXTRACTOR_VERSION = "1"
 
 def extract_qa_pairs(transcript: str):
     """
@@ -10,9 +10,19 @@ def extract_qa_pairs(transcript: str):
     if not transcript or len(transcript.strip()) == 0:
         return []
 
-    doc = nlp(transcript)
-    sentences = [sent.text.strip() for sent in doc.sents]
+    # spaCy (shared via the registry) for sentence segmentation
+    doc = get_model("spacy")(transcript)
+    return [
+        {"question": qa["question"], "answer": qa["answer"]}
+        for qa in extract_qa_spans(doc)
+    ]
 
+def extract_qa_spans(doc):
+    """
+    Same splitting as extract_qa_pairs, but over an already-parsed Doc. Each pair also
+    carries `answer_span`, the contiguous Span of its answer sentences, so answers can be
+    scored without parsing them again.
+    """
     qa_pairs = []
     current_question = ""
     current_answer = []
@@ -23,7 +33,8 @@ def extract_qa_pairs(transcript: str):
         "could", "can", "would", "do", "did", "share"
     )
 
-    for sent in sentences:
+    for sent_span in doc.sents:
+        sent = sent_span.text.strip()
         sent_lower = sent.lower()
         
         # Logic: If it ends with '?' or starts with a question word, it's likely a question
@@ -32,30 +43,33 @@ def extract_qa_pairs(transcript: str):
         if is_question:
             # If we were already building an answer for a previous question, save it
             if current_question and current_answer:
-                qa_pairs.append({
-                    "question": current_question,
-                    "answer": " ".join(current_answer)
-                })
+                qa_pairs.append(_make_pair(doc, current_question, current_answer))
                 current_answer = [] # Reset for next pair
 
             current_question = sent
         else:
             # If it's not a question, it must be part of the answer
             if current_question:
-                current_answer.append(sent)
+                current_answer.append(sent_span)
 
     # Add the final pair to the list
     if current_question and current_answer:
-        qa_pairs.append({
-            "question": current_question,
-            "answer": " ".join(current_answer)
-        })
+        qa_pairs.append(_make_pair(doc, current_question, current_answer))
 
     # Fallback: If no questions were detected, treat the whole thing as one answer
-    if not qa_pairs and transcript:
+    if not qa_pairs and doc.text:
         qa_pairs.append({
             "question": "General Interview Context",
-            "answer": transcript
+            "answer": doc.text,
+            "answer_span": doc[:]
         })
 
-    return qa_pairs
\ No newline at end of file
+    return qa_pairs
+
+def _make_pair(doc, question, answer_sents):
+    # Answer sentences sit between two questions, so they form one contiguous span
+    return {
+        "question": question,
+        "answer": " ".join(sent.text.strip() for sent in answer_sents),
+        "answer_span": doc[answer_sents[0].start:answer_sents[-1].end]
+    }
\ No newline at end of file
@@ -0,0 +1,230 @@
+import os
+import json
+import zlib
+from datetime import datetime, timezone
+from bson import Binary
+from pymongo import ASCENDING
+from pymongo.errors import PyMongoError
+from database import db, reports_collection
+
+# 📦 Bulky report payloads (transcript segments, full Q&A analysis, per-second emotion data)
+# live here as compressed chunks, so the report document stays small no matter how long
+# the interview is. The report keeps summary fields plus a `payloads.<field>` reference.
+payloads_collection = db["report_payloads"]
+
+PAYLOAD_OFFLOAD_ENABLED = os.getenv("PAYLOAD_OFFLOAD_ENABLED", "true").lower() == "true"
+PAYLOAD_CHUNK_ITEMS = int(os.getenv("PAYLOAD_CHUNK_ITEMS", "500"))
+PAYLOAD_COMPRESSION_LEVEL = int(os.getenv("PAYLOAD_COMPRESSION_LEVEL", "6"))
+# Emotion runs / stress moments kept inline up to this many; longer lists go to the store
+PAYLOAD_INLINE_ITEMS = int(os.getenv("PAYLOAD_INLINE_ITEMS", "200"))
+
+def _mmss_seconds(timestamp):
+    minutes, seconds = timestamp.split(":")
+    return int(minutes) * 60 + int(seconds)
+
+# Time span (seconds) covered by one item, for range reads; None for untimed payloads
+PAYLOAD_SPANS = {
+    "transcript": lambda i, seg: (seg["start"], seg["end"]),
+    "raw_emotions": lambda i, label: (i, i + 1),  # One label per second
+    "emotion_percentages": lambda i, pair: (_mmss_seconds(pair[0]), _mmss_seconds(pair[0]) + 1),
+    "analysis": None,
+    "emotion_timeline": None,  # [code, run length] pairs
+    "stress_timeline": None,
+}
+
+def ensure_payload_indexes():
+    payloads_collection.create_index(
+        [("interview_id", ASCENDING), ("field", ASCENDING), ("seq", ASCENDING)], unique=True
+    )
+
+def _pack(items):
+    raw = json.dumps(items, separators=(",", ":"), default=str).encode("utf-8")
+    return Binary(zlib.compress(raw, PAYLOAD_COMPRESSION_LEVEL))
+
+def _unpack(blob):
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+def store_payload(interview_id: str, field: str, items: list):
+    """
+    Replaces the stored chunks of one payload. Returns the reference kept on the
+    report ({"chunks", "items", "stored_bytes"}), or None if the write failed.
+    """
+    span = PAYLOAD_SPANS[field]
+    chunks = []
+    for seq, first in enumerate(range(0, len(items), PAYLOAD_CHUNK_ITEMS)):
+        part = items[first:first + PAYLOAD_CHUNK_ITEMS]
+        chunk = {"interview_id": interview_id, "field": field, "seq": seq, "data": _pack(part)}
+        if span:
+            spans = [span(first + i, item) for i, item in enumerate(part)]
+            chunk["start"] = min(s for s, _ in spans)
+            chunk["end"] = max(e for _, e in spans)
+        chunks.append(chunk)
+
+    try:
+        # Re-runs (retries, re-scoring) overwrite the previous version
+        payloads_collection.delete_many({"interview_id": interview_id, "field": field})
+        if chunks:
+            payloads_collection.insert_many(chunks, ordered=False)
+    except PyMongoError as e:
+        print(f"❌ Payload Store Error ({field}): {e}")
+        return None
+
+    return {
+        "chunks": len(chunks),
+        "items": len(items),
+        "stored_bytes": sum(len(c["data"]) for c in chunks),
+        "updated_at": datetime.now(timezone.utc)
+    }
+
+def load_payload(interview_id: str, field: str, start: float = None, end: float = None):
+    """
+    Reads a payload back as a list. With `start`/`end` (seconds) only chunks overlapping
+    the range are fetched, and only items overlapping it are returned.
+    """
+    span = PAYLOAD_SPANS[field]
+    query = {"interview_id": interview_id, "field": field}
+    ranged = span is not None and (start is not None or end is not None)
+    if ranged:
+        if start is not None:
+            query["end"] = {"$gte": start}
+        if end is not None:
+            query["start"] = {"$lte": end}
+
+    items = []
+    for chunk in payloads_collection.find(query).sort("seq", ASCENDING):
+        part = _unpack(chunk["data"])
+        if not ranged:
+            items.extend(part)
+            continue
+        # Item indexes are global (raw_emotions are timed by position)
+        offset = chunk["seq"] * PAYLOAD_CHUNK_ITEMS
+        for i, item in enumerate(part):
+            item_start, item_end = span(offset + i, item)
+            if (start is None or item_end >= start) and (end is None or item_start <= end):
+                items.append(item)
+    return items
+
+def delete_payloads(interview_id: str):
+    try:
+        payloads_collection.delete_many({"interview_id": interview_id})
+    except PyMongoError as e:
+        print(f"❌ Payload Delete Error: {e}")
+
+def offload_stage_output(interview_id: str, data: dict):
+    """
+    Splits a stage's output into the fields that stay on the report and the bulky
+    parts stored as payload chunks. Returns (fields_to_set, fields_to_unset).
+    If a payload can't be stored it simply stays inline.
+    """
+    if not PAYLOAD_OFFLOAD_ENABLED:
+        return data, None
+
+    fields = dict(data)
+    unset = {}
+    refs = {}
+
+    for field in ("transcript", "raw_emotions"):
+        if isinstance(fields.get(field), list):
+            ref = store_payload(interview_id, field, fields[field])
+            if ref:
+                refs[field] = ref
+                del fields[field]
+                unset[field] = ""
+
+    if isinstance(fields.get("analysis"), list):
+        ref = store_payload(interview_id, "analysis", fields["analysis"])
+        if ref:
+            refs["analysis"] = ref
+            # The first answer holds the headline scores the listing and comparison read
+            fields["analysis"] = fields["analysis"][:1]
+
+    emotions = fields.get("emotions")
+    if isinstance(emotions, dict):
+        emotions = dict(emotions)
+        if "emotion_percentages" in emotions:
+            ref = store_payload(interview_id, "emotion_percentages", list(emotions["emotion_percentages"].items()))
+            if ref:
+                refs["emotion_percentages"] = ref
+                del emotions["emotion_percentages"]
+
+        # Compact, but still one run per emotion change / one entry per stress moment
+        timeline = emotions.get("emotion_timeline")
+        if timeline and len(timeline["codes"]) > PAYLOAD_INLINE_ITEMS:
+            ref = store_payload(interview_id, "emotion_timeline", [list(run) for run in zip(timeline["codes"], timeline["lengths"])])
+            if ref:
+                refs["emotion_timeline"] = ref
+                emotions["emotion_timeline"] = {k: v for k, v in timeline.items() if k not in ("codes", "lengths")}
+        stress = emotions.get("stress_timeline")
+        if stress and len(stress) > PAYLOAD_INLINE_ITEMS:
+            ref = store_payload(interview_id, "stress_timeline", stress)
+            if ref:
+                refs["stress_timeline"] = ref
+                del emotions["stress_timeline"]
+
+        # A re-saved summary that now fits inline must not be hydrated from older chunks
+        for field in ("emotion_timeline", "stress_timeline"):
+            if field not in refs:
+                unset[f"payloads.{field}"] = ""
+        fields["emotions"] = emotions
+
+    for field, ref in refs.items():
+        fields[f"payloads.{field}"] = ref
+    return fields, unset or None
+
+def hydrate_reports(reports, fields=None):
+    """
+    Puts offloaded payloads back on report documents (in place), in one query for
+    the whole batch, so full views look exactly like inline reports.
+    """
+    wanted = {}
+    for report in reports:
+        refs = (report or {}).get("payloads") or {}
+        for field in refs:
+            if fields is None or field in fields:
+                wanted.setdefault(report["interview_id"], []).append(field)
+    if not wanted:
+        return reports
+
+    query = {
+        "interview_id": {"$in": list(wanted)},
+        "field": {"$in": sorted({f for names in wanted.values() for f in names})}
+    }
+    loaded = {}
+    sort = [("interview_id", ASCENDING), ("field", ASCENDING), ("seq", ASCENDING)]
+    for chunk in payloads_collection.find(query).sort(sort):
+        loaded.setdefault((chunk["interview_id"], chunk["field"]), []).extend(_unpack(chunk["data"]))
+
+    for report in reports:
+        for field in wanted.get((report or {}).get("interview_id"), []):
+            items = loaded.get((report["interview_id"], field), [])
+            if field == "emotion_percentages":
+                report.setdefault("emotions", {})["emotion_percentages"] = dict(items)
+            elif field == "emotion_timeline":
+                timeline = report.setdefault("emotions", {}).setdefault("emotion_timeline", {})
+                timeline["codes"] = [code for code, _ in items]
+                timeline["lengths"] = [length for _, length in items]
+            elif field == "stress_timeline":
+                report.setdefault("emotions", {})["stress_timeline"] = items
+            else:
+                report[field] = items
+    return reports
+
+def get_transcript_range(interview_id: str, start: float = None, end: float = None):
+    """Transcript segments overlapping [start, end] seconds; None if the report doesn't exist."""
+    report = reports_collection.find_one(
+        {"interview_id": interview_id}, {"payloads.transcript": 1, "transcript": 1}
+    )
+    if not report:
+        return None
+
+    if "transcript" in (report.get("payloads") or {}):
+        return load_payload(interview_id, "transcript", start, end)
+
+    # Reports saved before offloading keep their segments inline
+    transcript = report.get("transcript")
+    if not isinstance(transcript, list):
+        return []
+    return [
+        seg for seg in transcript
+        if (start is None or seg["end"] >= start) and (end is None or seg["start"] <= end)
+    ]
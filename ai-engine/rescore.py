@@ -0,0 +1,321 @@
+# 🔁 Bulk re-scoring: `python rescore.py` refreshes stored reports after a change to the
+# lexicons, the scoring rules or summarize_emotions, without re-running Whisper or FER.
+# Q&A extraction and text analysis are recomputed from the saved transcript segments and
+# emotion summaries from the saved per-second labels. Each report records the versions it
+# was scored with (`analyzer_version`, `emotion_summary_version`), so only stale reports
+# are read, and a checkpoint makes an interrupted run continue where it stopped.
+import os
+import sys
+import socket
+import argparse
+import subprocess
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from pymongo import ASCENDING, UpdateOne, ReturnDocument
+from pymongo.errors import CursorNotFound, DuplicateKeyError, PyMongoError
+from database import db, reports_collection
+from report_payloads import offload_stage_output, hydrate_reports
+from emotion_summary import summarize_emotions, timeline_labels, timeline_from_legacy, EMOTION_SUMMARY_VERSION
+
+checkpoints_collection = db["rescore_checkpoints"]
+CHECKPOINT_ID = "rescore"
+
+RESCORE_BATCH_SIZE = int(os.getenv("RESCORE_BATCH_SIZE", "50"))
+RESCORE_WORKERS = int(os.getenv("RESCORE_WORKERS", "2"))
+# A run that hasn't checkpointed for this long is considered dead and can be taken over
+RESCORE_LOCK_SECONDS = int(os.getenv("RESCORE_LOCK_SECONDS", "600"))
+
+RESCORE_PROJECTION = {
+    "interview_id": 1,
+    "interview_type": 1,
+    "analyzer_version": 1,
+    "emotion_summary_version": 1,
+    "transcript": 1,
+    "raw_emotions": 1,
+    "payloads.transcript": 1,
+    "payloads.raw_emotions": 1,
+    "emotions.emotion_timeline": 1,
+    "emotions.emotion_percentages": 1
+}
+
+def current_versions():
+    """Target versions: text analysis per interview type (lexicons differ), emotions globally."""
+    from analyzer import scoring_version
+
+    types = set(reports_collection.distinct("interview_type", {"status": "Completed"})) | {None}
+    return {
+        # A list rather than a map: stored types ("", None, free-form text) aren't all valid keys.
+        # Fingerprinted from the lexicon files as they are now, not a process-level cache.
+        "analysis": [
+            {"interview_type": t, "version": scoring_version(t, cached=False)}
+            for t in sorted(types, key=lambda t: (t is not None, str(t)))
+        ],
+        "emotions": EMOTION_SUMMARY_VERSION
+    }
+
+def analysis_version(versions, interview_type):
+    return next((target["version"] for target in versions["analysis"] if target["interview_type"] == interview_type), None)
+
+def stale_query(versions, after=None):
+    stale = {"emotion_summary_version": {"$ne": versions["emotions"]}}
+    query = {
+        "status": "Completed",
+        "$or": [
+            # None also matches reports without the field
+            {"interview_type": target["interview_type"], "$or": [{"analyzer_version": {"$ne": target["version"]}}, stale]}
+            for target in versions["analysis"]
+        ]
+    }
+    if after is not None:
+        query["_id"] = {"$gt": after}
+    return query
+
+def count_stale(versions=None):
+    return reports_collection.count_documents(stale_query(versions or current_versions()))
+
+def iter_stale_batches(versions, after=None, batch_size=RESCORE_BATCH_SIZE):
+    """Streams stale reports in _id order, `batch_size` at a time, over one cursor."""
+    batch = []
+    while True:
+        try:
+            cursor = reports_collection.find(stale_query(versions, after), RESCORE_PROJECTION)
+            for doc in cursor.sort("_id", ASCENDING).batch_size(batch_size):
+                after = doc["_id"]
+                batch.append(doc)
+                if len(batch) == batch_size:
+                    yield batch
+                    batch = []
+            break
+        except CursorNotFound:
+            # Idle too long while earlier batches were scored: reopen after the last report read
+            continue
+    if batch:
+        yield batch
+
+def _transcript_text(transcript):
+    if isinstance(transcript, list):
+        return " ".join(seg["text"] for seg in transcript)
+    return transcript  # Reports from before timestamped segments stored a plain string
+
+def _emotion_labels(doc):
+    """Per-second labels: the raw FER output, or rebuilt from the stored timeline for older reports."""
+    if doc.get("raw_emotions"):
+        return doc["raw_emotions"]
+    emotions = doc.get("emotions") or {}
+    if emotions.get("emotion_timeline"):
+        return timeline_labels(emotions["emotion_timeline"])
+    if emotions.get("emotion_percentages"):
+        return timeline_labels(timeline_from_legacy(emotions["emotion_percentages"]))
+    return None
+
+def rescore_report(doc, versions):
+    """
+    Recomputes the stale parts of one report. Returns the fields to set, or {} when
+    nothing could be recomputed (missing source data is left for a full re-run).
+    """
+    from analyzer import analyze_transcript, count_keywords
+
+    update = {}
+    analyzer_version = analysis_version(versions, doc.get("interview_type"))
+    if doc.get("analyzer_version") != analyzer_version:
+        text = _transcript_text(doc.get("transcript"))
+        # An empty transcript here means the segments are missing, not that nobody spoke
+        if text and text.strip():
+            update["analysis"] = analyze_transcript(text, doc.get("interview_type"))
+            update["keyword_counts"] = count_keywords(text)
+            update["analyzer_version"] = analyzer_version
+
+    if doc.get("emotion_summary_version") != versions["emotions"]:
+        labels = _emotion_labels(doc)
+        if labels:
+            update["emotions"] = summarize_emotions(labels, fps=1)
+            update["emotion_summary_version"] = versions["emotions"]
+    return update
+
+def rescore_batch(docs, versions):
+    """Runs in a pool process (spaCy is loaded once per process). Returns [(interview_id, update)]."""
+    results = []
+    for doc in docs:
+        try:
+            results.append((doc["interview_id"], rescore_report(doc, versions)))
+        except Exception as e:
+            print(f"❌ Re-scoring failed for {doc.get('interview_id')}: {e}")
+            results.append((doc["interview_id"], None))
+    return results
+
+def _load_sources(docs, versions):
+    """Fetches the offloaded transcripts / raw emotions each stale part needs, one query per kind."""
+    stale_analysis = [d for d in docs if d.get("analyzer_version") != analysis_version(versions, d.get("interview_type"))]
+    stale_emotions = [d for d in docs if d.get("emotion_summary_version") != versions["emotions"]]
+    hydrate_reports(stale_analysis, fields=["transcript"])
+    hydrate_reports(stale_emotions, fields=["raw_emotions"])
+    for doc in docs:
+        doc.pop("payloads", None)  # Not needed in the pool; keeps the pickled batch small
+    return docs
+
+def write_batch(results):
+    """One bulk write per batch. Returns (updated, skipped, failed)."""
+    ops = []
+    skipped = failed = 0
+    now = datetime.now(timezone.utc)
+    # Payload chunks are overwritten before the report update below, so reports that left
+    # "Completed" while the batch was scored (a re-run) are dropped first: their pipeline
+    # writes its own payloads and versions
+    completed = set(reports_collection.distinct("interview_id", {
+        "interview_id": {"$in": [interview_id for interview_id, update in results if update]},
+        "status": "Completed"
+    }))
+    for interview_id, update in results:
+        if update is None:
+            failed += 1
+            continue
+        if not update or interview_id not in completed:
+            skipped += 1
+            continue
+
+        data = {k: update.pop(k) for k in ("analysis", "emotions") if k in update}
+        # Same layout as the pipeline: full analysis / chart map in the payload store
+        fields, unset = offload_stage_output(interview_id, data)
+        fields.update(update)
+        fields["rescored_at"] = now
+        op = {"$set": fields}
+        if unset:
+            op["$unset"] = unset
+        # Still guarded, for a re-run that starts between the check above and this write
+        ops.append(UpdateOne({"interview_id": interview_id, "status": "Completed"}, op))
+
+    if ops:
+        reports_collection.bulk_write(ops, ordered=False)
+    return len(ops), skipped, failed
+
+def _acquire_checkpoint(owner, versions, restart=False):
+    """
+    Takes the run lock and returns the checkpoint to continue from (a fresh one when the
+    target versions changed, or with `restart`). None if another run holds the lock.
+    """
+    now = datetime.now(timezone.utc)
+    try:
+        previous = checkpoints_collection.find_one_and_update(
+            {"_id": CHECKPOINT_ID, "$or": [
+                {"owner": None},
+                {"heartbeat_at": {"$lt": now - timedelta(seconds=RESCORE_LOCK_SECONDS)}}
+            ]},
+            {"$set": {"owner": owner, "heartbeat_at": now}},
+            upsert=True,
+            return_document=ReturnDocument.BEFORE
+        )
+    except DuplicateKeyError:
+        return None
+
+    if previous and not restart and previous.get("versions") == versions and not previous.get("finished_at"):
+        print(f"🔄 Resuming re-scoring after {previous.get('last_id')} ({previous.get('scanned', 0)} scanned)")
+        return previous
+
+    fresh = {
+        "versions": versions,
+        "last_id": None,
+        "scanned": 0,
+        "updated": 0,
+        "skipped": 0,
+        "failed": 0,
+        "started_at": now,
+        "finished_at": None
+    }
+    checkpoints_collection.update_one({"_id": CHECKPOINT_ID}, {"$set": fresh})
+    return fresh
+
+def _save_checkpoint(owner, last_id, counts):
+    checkpoints_collection.update_one(
+        {"_id": CHECKPOINT_ID, "owner": owner},
+        {"$set": {"last_id": last_id, "heartbeat_at": datetime.now(timezone.utc), **counts}}
+    )
+
+def run_rescore(batch_size=RESCORE_BATCH_SIZE, workers=RESCORE_WORKERS, restart=False):
+    """Re-scores every stale report. Returns the final counts, or None if another run is active."""
+    owner = f"{socket.gethostname()}:{os.getpid()}"
+    versions = current_versions()
+    checkpoint = _acquire_checkpoint(owner, versions, restart)
+    if checkpoint is None:
+        print("⚠️ Another re-scoring run is in progress")
+        return None
+
+    counts = {k: checkpoint.get(k, 0) for k in ("scanned", "updated", "skipped", "failed")}
+    batches = iter_stale_batches(versions, checkpoint.get("last_id"), batch_size)
+    # spawn: pool processes load their own spaCy pipeline, nothing is fork-shared
+    pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) if workers > 1 else None
+    pending = deque()
+
+    def finish_oldest():
+        # Batches are written (and checkpointed) in _id order, so the checkpoint never skips a report
+        last_id, future = pending.popleft()
+        results = future.result() if pool else future
+        updated, skipped, failed = write_batch(results)
+        counts["scanned"] += len(results)
+        counts["updated"] += updated
+        counts["skipped"] += skipped
+        counts["failed"] += failed
+        _save_checkpoint(owner, last_id, counts)
+        print(f"🔄 Re-scored {counts['updated']} report(s), {counts['scanned']} scanned")
+
+    try:
+        for docs in batches:
+            _load_sources(docs, versions)
+            last_id = docs[-1]["_id"]
+            if pool:
+                pending.append((last_id, pool.submit(rescore_batch, docs, versions)))
+                # Keep every process busy while bounding how many batches sit in memory
+                if len(pending) >= workers * 2:
+                    finish_oldest()
+            else:
+                pending.append((last_id, rescore_batch(docs, versions)))
+                finish_oldest()
+        while pending:
+            finish_oldest()
+
+        checkpoints_collection.update_one(
+            {"_id": CHECKPOINT_ID, "owner": owner},
+            {"$set": {"finished_at": datetime.now(timezone.utc), **counts}}
+        )
+        print(f"✅ Re-scoring done: {counts['updated']} updated, {counts['skipped']} skipped, {counts['failed']} failed")
+        return counts
+    finally:
+        if pool:
+            pool.shutdown(cancel_futures=True)
+        try:
+            checkpoints_collection.update_one({"_id": CHECKPOINT_ID, "owner": owner}, {"$set": {"owner": None}})
+        except PyMongoError as e:
+            print(f"❌ Checkpoint Release Error: {e}")
+
+def rescore_status():
+    """Checkpoint of the current/last run plus how many reports are stale right now."""
+    checkpoint = checkpoints_collection.find_one({"_id": CHECKPOINT_ID}, {"_id": 0, "last_id": 0}) or {}
+    checkpoint["running"] = bool(checkpoint.get("owner"))
+    checkpoint["stale"] = count_stale()
+    return checkpoint
+
+def launch_rescore(restart=False):
+    """Starts a detached run, so the API process never loads spaCy itself."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    args = [sys.executable, os.path.join(here, "rescore.py")]
+    if restart:
+        args.append("--restart")
+    subprocess.Popen(args, cwd=here, start_new_session=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-score stored interviews with the current analyzers")
+    parser.add_argument("--batch-size", type=int, default=RESCORE_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=RESCORE_WORKERS,
+                        help="scoring processes (1 = score in this process)")
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and start over")
+    parser.add_argument("--count", action="store_true", help="only print how many reports are stale")
+    args = parser.parse_args()
+
+    if args.count:
+        print(f"📊 {count_stale()} stale report(s)")
+        return 0
+    return 0 if run_rescore(args.batch_size, args.workers, args.restart) is not None else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+import os
+import time
+import threading
+from datetime import datetime, timezone
+from collections import Counter
+from bson import encode
+from pymongo import ASCENDING, ReturnDocument
+from database import db
+
+# Per-stage pipeline outputs keyed by video content hash + model/lexicon versions,
+# so a re-uploaded recording skips Whisper/FER/spaCy entirely.
+cache_collection = db["result_cache"]
+cache_stats_collection = db["cache_stats"]
+
+# Eviction: entries unused for RESULT_CACHE_MAX_AGE_DAYS expire via a TTL index,
+# and the least recently used ones are dropped once the cache outgrows RESULT_CACHE_MAX_MB.
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() == "true"
+RESULT_CACHE_MAX_AGE_DAYS = int(os.getenv("RESULT_CACHE_MAX_AGE_DAYS", "30"))
+RESULT_CACHE_MAX_MB = int(os.getenv("RESULT_CACHE_MAX_MB", "1024"))
+# Measuring the cache is a full-collection aggregate, so a process only does it after writing
+# this fraction of the budget since its last check, or when the last check is this old
+RESULT_CACHE_CHECK_FRACTION = float(os.getenv("RESULT_CACHE_CHECK_FRACTION", "0.05"))
+RESULT_CACHE_CHECK_SECONDS = int(os.getenv("RESULT_CACHE_CHECK_SECONDS", "600"))
+
+# In-process counters; the cache_stats collection aggregates them across workers
+local_stats = Counter()
+
+_unchecked_bytes = 0
+_last_size_check = None
+_size_check_lock = threading.Lock()
+
+def _now():
+    return datetime.now(timezone.utc)
+
+def ensure_cache_indexes():
+    cache_collection.create_index(
+        "last_used_at", expireAfterSeconds=RESULT_CACHE_MAX_AGE_DAYS * 24 * 3600
+    )
+    cache_collection.create_index([("content_hash", ASCENDING), ("stage", ASCENDING)])
+
+def _record(stage: str, outcome: str):
+    local_stats[f"{stage}:{outcome}"] += 1
+    try:
+        cache_stats_collection.update_one(
+            {"_id": stage}, {"$inc": {outcome: 1}}, upsert=True
+        )
+    except Exception as e:
+        print(f"❌ Cache Stats Error: {e}")
+
+def _key(content_hash: str, stage: str, version: str):
+    return f"{content_hash}:{stage}:{version}"
+
+def get_cached(content_hash: str, stage: str, version: str):
+    """Returns the cached payload for this content/stage/version, or None on a miss."""
+    if not RESULT_CACHE_ENABLED or not content_hash:
+        return None
+
+    try:
+        entry = cache_collection.find_one_and_update(
+            {"_id": _key(content_hash, stage, version)},
+            {"$set": {"last_used_at": _now()}, "$inc": {"hits": 1}},
+            return_document=ReturnDocument.AFTER
+        )
+    except Exception as e:
+        print(f"❌ Cache Read Error: {e}")
+        return None
+
+    _record(stage, "hits" if entry else "misses")
+    if entry:
+        print(f"⚡ Cache hit: {stage} ({content_hash[:12]})")
+        return entry["payload"]
+    return None
+
+def put_cached(content_hash: str, stage: str, version: str, payload):
+    """Stores a stage output; now and then trims the cache back under its size budget."""
+    if not RESULT_CACHE_ENABLED or not content_hash:
+        return
+
+    entry = {
+        "content_hash": content_hash,
+        "stage": stage,
+        "version": version,
+        "payload": payload,
+        "created_at": _now(),
+        "last_used_at": _now(),
+        "hits": 0
+    }
+    entry["size_bytes"] = len(encode(entry))
+
+    try:
+        cache_collection.replace_one({"_id": _key(content_hash, stage, version)}, entry, upsert=True)
+        if _size_check_due(entry["size_bytes"]):
+            evict_to_size()
+    except Exception as e:
+        print(f"❌ Cache Write Error: {e}")
+
+def _size_check_due(written_bytes: int):
+    """Counts bytes written by this process; True when the cache should be measured again."""
+    global _unchecked_bytes, _last_size_check
+    with _size_check_lock:
+        _unchecked_bytes += written_bytes
+        now = time.monotonic()
+        fresh = _last_size_check is not None and now - _last_size_check < RESULT_CACHE_CHECK_SECONDS
+        if fresh and _unchecked_bytes < RESULT_CACHE_MAX_MB * 1024 * 1024 * RESULT_CACHE_CHECK_FRACTION:
+            return False
+        _unchecked_bytes = 0
+        _last_size_check = now
+        return True
+
+def evict_to_size(max_mb: int = None):
+    """Drops least-recently-used entries until the cache fits in `max_mb`."""
+    max_bytes = (max_mb or RESULT_CACHE_MAX_MB) * 1024 * 1024
+    totals = list(cache_collection.aggregate([
+        {"$group": {"_id": None, "bytes": {"$sum": "$size_bytes"}}}
+    ]))
+    excess = (totals[0]["bytes"] if totals else 0) - max_bytes
+    if excess <= 0:
+        return 0
+
+    evicted = []
+    for entry in cache_collection.find({}, {"size_bytes": 1}).sort("last_used_at", ASCENDING):
+        if excess <= 0:
+            break
+        evicted.append(entry["_id"])
+        excess -= entry.get("size_bytes", 0)
+
+    cache_collection.delete_many({"_id": {"$in": evicted}})
+    _record("eviction", "evictions")
+    return len(evicted)
+
+def get_cache_stats():
+    """Hit/miss counters per stage, across all processes sharing the database."""
+    return {
+        "stages": {doc.pop("_id"): doc for doc in cache_stats_collection.find()},
+        "local": dict(local_stats),
+        "entries": cache_collection.estimated_document_count()
+    }
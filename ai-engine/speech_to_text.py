@@ -1,37 +1,172 @@
-import whisper
-import torch
 import os
+import types
+import threading
+from contextlib import contextmanager
+import numpy as np
+from concurrent.futures import as_completed
+from concurrent.futures.process import BrokenProcessPool
+from audio_extractor import WHISPER_SAMPLE_RATE, load_audio_array
+from model_registry import get_model, get_process_pool, discard_process_pool, torch_device, WHISPER_MODEL_NAME
 
-# Check if NVIDIA GPU is available
-device = "cuda" if torch.cuda.is_available() else "cpu"
+# Chunked mode: split long audio at silences and transcribe chunks in parallel processes
+WHISPER_WORKERS = int(os.getenv("WHISPER_WORKERS", "1"))
+WHISPER_CHUNK_SECONDS = float(os.getenv("WHISPER_CHUNK_SECONDS", "120"))
+# Frames quieter than this (dBFS) count as silence
+WHISPER_SILENCE_DB = float(os.getenv("WHISPER_SILENCE_DB", "-40"))
 
-# Load model onto the specific device once during server startup
-print(f"Loading Whisper model on {device}...")
-model = whisper.load_model("base", device=device)
+SAMPLE_RATE = WHISPER_SAMPLE_RATE
+ENERGY_FRAME = int(SAMPLE_RATE * 0.03)  # 30 ms analysis frames
 
-def transcribe_audio(audio_path: str):
+_whisper_progress_lock = threading.Lock()
+
+@contextmanager
+def _whisper_progress(progress):
+    """
+    Whisper only reports progress through a tqdm bar over mel frames (drawn when
+    verbose=False). For one in-process transcription, whisper.transcribe's `tqdm` is
+    swapped for a shim that forwards the updates to progress(seconds_done, seconds_total).
+    Yields whether the hook is installed.
+    """
+    try:
+        import whisper.transcribe as whisper_transcribe
+        from whisper.audio import FRAMES_PER_SECOND
+    except ImportError:
+        whisper_transcribe = None
+    if progress is None or whisper_transcribe is None or not hasattr(whisper_transcribe, "tqdm"):
+        yield False
+        return
+
+    class ProgressBar:
+        def __init__(self, total=None, **kwargs):
+            self.total = round((total or 0) / FRAMES_PER_SECOND, 1)
+            self.done = 0.0
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def update(self, n=1):
+            self.done += n / FRAMES_PER_SECOND
+            progress(round(min(self.done, self.total), 1), self.total)
+
+    with _whisper_progress_lock:
+        original = whisper_transcribe.tqdm
+        whisper_transcribe.tqdm = types.SimpleNamespace(tqdm=ProgressBar)
+        try:
+            yield True
+        finally:
+            whisper_transcribe.tqdm = original
+
+def _to_segments(result, offset=0.0):
+    # 🔥 Extract segments with timestamps for interactive UI
+    segments = []
+    for segment in result.get("segments", []):
+        segments.append({
+            "start": round(segment["start"] + offset, 2),
+            "end": round(segment["end"] + offset, 2),
+            "text": segment["text"].strip()
+        })
+    return segments
+
+def _voiced_frames(waveform):
+    """Boolean per 30 ms frame: True where RMS energy is above the silence threshold."""
+    n_frames = len(waveform) // ENERGY_FRAME
+    if n_frames == 0:
+        return np.zeros(0, dtype=bool)
+    frames = waveform[:n_frames * ENERGY_FRAME].reshape(n_frames, ENERGY_FRAME)
+    rms = np.sqrt(np.mean(frames ** 2, axis=1))
+    return 20 * np.log10(np.maximum(rms, 1e-10)) > WHISPER_SILENCE_DB
+
+def split_on_silence(waveform, chunk_seconds=None):
     """
-    Takes audio file path and returns a list of timestamped segments
-    for real-time dashboard synchronization and click-to-seek.
+    Cuts the waveform into ~chunk_seconds pieces, moving each cut to the nearest
+    silent frame within a quarter chunk of the target so words are not split.
+    Returns [(start_sample, end_sample, has_speech), ...].
     """
-    if not os.path.exists(audio_path):
+    chunk_frames = max(int((chunk_seconds or WHISPER_CHUNK_SECONDS) * SAMPLE_RATE) // ENERGY_FRAME, 1)
+    voiced = _voiced_frames(waveform)
+    n_frames = len(voiced)
+    silent_idx = np.flatnonzero(~voiced)
+
+    cuts = [0]
+    while n_frames - cuts[-1] > chunk_frames:
+        target = cuts[-1] + chunk_frames
+        window = chunk_frames // 4
+        nearby = silent_idx[(silent_idx > target - window) & (silent_idx < target + window)]
+        cuts.append(int(nearby[np.argmin(np.abs(nearby - target))]) if len(nearby) else target)
+    cuts.append(n_frames)
+
+    chunks = []
+    for start, end in zip(cuts[:-1], cuts[1:]):
+        end_sample = len(waveform) if end == n_frames else end * ENERGY_FRAME
+        chunks.append((start * ENERGY_FRAME, end_sample, bool(voiced[start:end].any())))
+    return chunks
+
+def _transcribe_chunk(samples, offset):
+    """Worker entry point; each spawned worker loads its own Whisper model once via the registry."""
+    result = get_model("whisper").transcribe(samples, fp16=(torch_device() == "cuda"))
+    return _to_segments(result, offset)
+
+def transcribe_chunked(waveform, workers=None, chunk_seconds=None, progress=None):
+    """
+    Transcribes a 16 kHz waveform chunk by chunk across a process pool, skipping
+    silence-only chunks, and stitches the segments back on the global timeline.
+    `progress(seconds_done, seconds_total)` is called as chunks finish.
+    """
+    workers = workers or WHISPER_WORKERS
+    chunks = [c for c in split_on_silence(waveform, chunk_seconds) if c[2]]
+    if not chunks:
         return []
 
+    # Reused across jobs: pool workers keep their Whisper model loaded
+    pool = get_process_pool("whisper", workers)
     try:
+        futures = [
+            pool.submit(_transcribe_chunk, waveform[start:end], start / SAMPLE_RATE)
+            for start, end, _ in chunks
+        ]
+        if progress:
+            chunk_seconds_of = {f: (end - start) / SAMPLE_RATE for f, (start, end, _) in zip(futures, chunks)}
+            total = sum(chunk_seconds_of.values())
+            done = 0
+            for future in as_completed(futures):
+                done += chunk_seconds_of[future]
+                progress(round(done, 1), round(total, 1))
+
+        segments = []
+        for future in futures:
+            segments.extend(future.result())
+    except BrokenProcessPool:
+        discard_process_pool("whisper")
+        raise
+
+    return segments
+
+def transcribe_audio(audio, workers=None, progress=None):
+    """
+    Takes an audio file path or a 16 kHz float32 waveform and returns a list of
+    timestamped segments for real-time dashboard synchronization and click-to-seek.
+    """
+    if audio is None:
+        return []
+    if isinstance(audio, str) and not os.path.exists(audio):
+        return []
+
+    workers = workers or WHISPER_WORKERS
+    try:
+        if workers > 1:
+            waveform = load_audio_array(audio) if isinstance(audio, str) else audio
+            return transcribe_chunked(waveform, workers=workers, progress=progress)
+
         # fp16=False is necessary if you are running on a CPU
         # We use transcribe to get the full result dictionary including 'segments'
-        result = model.transcribe(audio_path, fp16=(device == "cuda"))
-        
-        # 🔥 Extract segments with timestamps for interactive UI
-        segments = []
-        for segment in result.get("segments", []):
-            segments.append({
-                "start": round(segment["start"], 2),
-                "end": round(segment["end"], 2),
-                "text": segment["text"].strip()
-            })
-            
-        return segments
+        model = get_model("whisper")
+        with _whisper_progress(progress) as reporting:
+            # verbose=False enables Whisper's progress bar, which the hook turns into callbacks
+            result = model.transcribe(audio, fp16=(torch_device() == "cuda"), verbose=False if reporting else None)
+        return _to_segments(result)
     except Exception as e:
         print(f"❌ Whisper Error: {e}")
-        return []
\ No newline at end of file
+        return []
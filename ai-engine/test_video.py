@@ -1,9 +1,10 @@
-from video_processor import extract_audio_from_video, extract_frames
+from audio_extractor import extract_audio_from_video
+from frame_extractor import extract_frames_from_video
 
 video_path = "test.mp4"
 
 audio = extract_audio_from_video(video_path)
 print("Audio extracted:", audio)
 
-frames = extract_frames(video_path)
+frames = extract_frames_from_video(video_path)
 print("Frames saved in:", frames)
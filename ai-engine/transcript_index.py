@@ -0,0 +1,82 @@
+import os
+import time
+import threading
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from database import reports_collection
+from report_payloads import load_payload
+
+# 🗂️ Mentor chat looks up "what was said around t" many times per minute while a user
+# scrubs the video. Each interview's transcript is indexed once (segments sorted by start)
+# and kept in a bounded LRU, so a warm lookup is a binary search with no database access.
+MENTOR_CONTEXT_WINDOW = float(os.getenv("MENTOR_CONTEXT_WINDOW", "15"))
+TRANSCRIPT_CACHE_SIZE = int(os.getenv("TRANSCRIPT_CACHE_SIZE", "128"))
+# Safety net for changes made by other processes (re-scoring, other API replicas)
+TRANSCRIPT_CACHE_TTL = float(os.getenv("TRANSCRIPT_CACHE_TTL", "600"))
+
+class TranscriptIndex:
+    """Segments sorted by start time with a parallel list of starts for bisect."""
+
+    def __init__(self, segments):
+        self.segments = sorted(segments, key=lambda seg: seg["start"])
+        self.starts = [seg["start"] for seg in self.segments]
+
+    def window(self, timestamp: float, radius: float):
+        """Segments starting strictly within `radius` seconds of `timestamp`, in O(log n)."""
+        lo = bisect_right(self.starts, timestamp - radius)
+        hi = bisect_left(self.starts, timestamp + radius)
+        return self.segments[lo:hi]
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+def _load_index(interview_id: str):
+    """Returns (index, final) or (None, False) when the report doesn't exist."""
+    report = reports_collection.find_one(
+        {"interview_id": interview_id},
+        {"status": 1, "stages.transcription.status": 1, "payloads.transcript": 1, "transcript": 1}
+    )
+    if not report:
+        return None, False
+
+    if "transcript" in (report.get("payloads") or {}):
+        segments = load_payload(interview_id, "transcript")
+    else:
+        segments = report.get("transcript") if isinstance(report.get("transcript"), list) else []
+
+    # Only a finished transcript is cached; while the pipeline runs it may still appear
+    final = (
+        report.get("status") == "Completed"
+        or ((report.get("stages") or {}).get("transcription") or {}).get("status") == "completed"
+    )
+    return TranscriptIndex(segments), final
+
+def get_transcript_index(interview_id: str):
+    """The interview's TranscriptIndex, from the LRU when warm; None if the report doesn't exist."""
+    now = time.monotonic()
+    with _lock:
+        entry = _cache.get(interview_id)
+        if entry and now - entry[1] < TRANSCRIPT_CACHE_TTL:
+            _cache.move_to_end(interview_id)
+            return entry[0]
+
+    index, final = _load_index(interview_id)
+    if index is not None and final:
+        with _lock:
+            _cache[interview_id] = (index, now)
+            _cache.move_to_end(interview_id)
+            while len(_cache) > TRANSCRIPT_CACHE_SIZE:
+                _cache.popitem(last=False)
+    return index
+
+def invalidate_transcript(interview_id: str):
+    """Drops a cached index; call whenever the report is updated or deleted."""
+    with _lock:
+        _cache.pop(interview_id, None)
+
+def get_context_segments(interview_id: str, timestamp: float, window: float = None):
+    """Transcript segments within `window` (default MENTOR_CONTEXT_WINDOW) seconds of `timestamp`."""
+    index = get_transcript_index(interview_id)
+    if index is None:
+        return None
+    return index.window(timestamp, MENTOR_CONTEXT_WINDOW if window is None else window)
@@ -0,0 +1,82 @@
+import os
+import hashlib
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse
+
+# Uploads are copied to disk in fixed-size chunks so memory stays bounded per request
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", str(1024 * 1024)))
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(2 * 1024 * 1024 * 1024)))
+# Room for the other form fields and multipart boundaries on top of the video itself
+UPLOAD_FORM_OVERHEAD_BYTES = int(os.getenv("UPLOAD_FORM_OVERHEAD_BYTES", str(1024 * 1024)))
+
+class UploadTooLargeError(Exception):
+    """Raised when a received upload turns out to be larger than MAX_UPLOAD_BYTES."""
+
+class UploadLimitMiddleware:
+    """
+    Turns oversized uploads away from their Content-Length header, before Starlette
+    reads (and spools) the request body. Requests without one get 411.
+    """
+    def __init__(self, app, paths, max_bytes: int = None):
+        self.app = app
+        self.paths = set(paths)
+        self.max_bytes = max_bytes or MAX_UPLOAD_BYTES
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            return await self.app(scope, receive, send)
+
+        length = dict(scope["headers"]).get(b"content-length")
+        if length is None or not length.isdigit():
+            response = JSONResponse(status_code=411, content={"detail": "Content-Length is required for uploads"})
+        elif int(length) > self.max_bytes + UPLOAD_FORM_OVERHEAD_BYTES:
+            limit_mb = self.max_bytes // (1024 * 1024)
+            response = JSONResponse(status_code=413, content={"detail": f"Video exceeds the {limit_mb} MB upload limit"})
+        else:
+            return await self.app(scope, receive, send)
+        await response(scope, receive, send)
+
+async def save_upload(upload, destination: str, max_bytes: int = None, chunk_size: int = None):
+    """
+    Copies a received UploadFile (already spooled by Starlette) to `destination` chunk
+    by chunk, hashing as it goes. The size check here is a backstop for what
+    UploadLimitMiddleware lets through. Returns (sha256_hex, size_bytes). The partial
+    file is removed on any failure.
+    """
+    max_bytes = max_bytes or MAX_UPLOAD_BYTES
+    chunk_size = chunk_size or UPLOAD_CHUNK_BYTES
+    sha256 = hashlib.sha256()
+    size = 0
+
+    try:
+        with open(destination, "wb") as buffer:
+            while True:
+                chunk = await upload.read(chunk_size)
+                if not chunk:
+                    break
+
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLargeError(f"Upload exceeds {max_bytes} bytes")
+
+                sha256.update(chunk)
+                # Disk writes happen off the event loop
+                await run_in_threadpool(buffer.write, chunk)
+    except BaseException:
+        if os.path.exists(destination):
+            os.remove(destination)
+        raise
+
+    return sha256.hexdigest(), size
+
+def remove_upload(video_path: str):
+    """Deletes a stored upload and the thumbnail the pipeline wrote next to it."""
+    if not video_path:
+        return
+    for path in (video_path, video_path.rsplit(".", 1)[0] + "_thumb.jpg"):
+        try:
+            if os.path.exists(path):
+                os.remove(path)
+        except OSError as e:
+            # e.g. still open on Windows by a worker that hasn't noticed the cancellation
+            print(f"⚠️ Could not remove {path}: {e}")
@@ -1,87 +1,256 @@
 import os
-import shutil
 import time
 import cv2
-from audio_extractor import extract_audio_from_video
-from frame_extractor import extract_frames_from_video
-from emotion_analyzer import analyze_emotions_from_frames
-from speech_to_text import transcribe_audio
-from emotion_summary import summarize_emotions
-from qa_extractor import extract_qa_pairs
-from analyzer import analyze_text
-from database import update_interview_status
-
-def process_video(video_path, interview_id):
+from concurrent.futures import ThreadPoolExecutor
+from audio_extractor import extract_audio_from_video, load_audio_array
+from emotion_analyzer import analyze_video_emotions, EMOTION_MODEL_VERSION
+from speech_to_text import transcribe_audio, WHISPER_MODEL_NAME
+from emotion_summary import summarize_emotions, EMOTION_SUMMARY_VERSION
+from analyzer import analyze_transcript, scoring_version, count_keywords
+from progress_events import report_stage, report_stages, progress_callback
+from result_cache import get_cached, put_cached
+from database import get_interview, mark_stage, save_stage_output
+from report_payloads import offload_stage_output, hydrate_reports
+from media_ingest import open_media
+from metrics import PipelineMetrics
+
+# Cache versions: a stage is reused only while every model/lexicon it depends on is unchanged
+TRANSCRIPT_VERSION = f"whisper-{WHISPER_MODEL_NAME}"
+RAW_EMOTIONS_VERSION = EMOTION_MODEL_VERSION
+
+def _format_duration(duration_seconds):
+    return f"{int(duration_seconds // 60)}:{int(duration_seconds % 60):02d}"
+
+def _ingest_metadata(video_path, media=None):
+    """⏱️ Calculates the duration string and writes the first frame as a thumbnail."""
+    if media is not None:
+        # Read from the container header; the shared demux writes the thumbnail
+        return _format_duration(media.duration_seconds)
+
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    duration_seconds = frame_count / fps if fps > 0 else 0
+    duration_str = _format_duration(duration_seconds)
+
+    thumb_path = video_path.rsplit(".", 1)[0] + "_thumb.jpg"
+    ret, frame = cap.read()
+    if ret:
+        cv2.imwrite(thumb_path, frame)
+    cap.release()
+
+    return duration_str
+
+def _transcribe(video_path, progress, media, metrics):
     audio_path = None
-    frames_folder = None
-    
+    try:
+        with metrics.stage("audio_extraction"):
+            # 🔥 Preferred path: decode straight to a 16 kHz waveform, no intermediate .wav
+            audio = media.audio() if media is not None else None
+            if audio is None:
+                audio = load_audio_array(video_path)
+            if audio is None:
+                # Fallback: moviepy writes a .wav, timed as part of the same extraction
+                audio = audio_path = extract_audio_from_video(video_path)
+        # 🔥 Now returns a list of segments: [{"start": 0.0, "end": 2.0, "text": "..."}, ...]
+        with metrics.stage("transcription"):
+            return transcribe_audio(audio, progress=progress)
+    finally:
+        if audio_path and os.path.exists(audio_path):
+            time.sleep(1)
+            try: os.remove(audio_path)
+            except: pass
+
+def _analyze_transcript(transcript_segments, interview_type=None, metrics=None):
+    # Create a full string version for Q&A extraction
+    full_transcript_text = " ".join([seg["text"] for seg in transcript_segments])
+
+    # One spaCy parse for both Q&A splitting and per-answer scoring
+    return analyze_transcript(full_transcript_text, interview_type, timer=metrics.stage if metrics else None)
+
+def _stage_completed(saved, stage):
+    return ((saved or {}).get("stages") or {}).get(stage, {}).get("status") == "completed"
+
+def _run_stage(interview_id, stage, compute):
+    """
+    Runs one stage with its status tracked in the report's `stages` map; the status
+    users see is derived from that map, so concurrent branches don't overwrite each other.
+    """
+    mark_stage(interview_id, stage, "running")
+    report_stages(interview_id)
+    try:
+        return compute()
+    except Exception as e:
+        mark_stage(interview_id, stage, "failed", error=str(e))
+        report_stages(interview_id)
+        raise
+
+def _save_stage(interview_id, stage, data, metrics):
+    with metrics.stage("mongo_writes"):
+        # Deleted mid-run: don't write payload chunks for a report that no longer exists
+        if get_interview(interview_id, {"_id": 1}) is None:
+            raise RuntimeError(f"Interview {interview_id} was deleted")
+        # Bulky parts go to the payload store; the report keeps summaries and references
+        fields, unset = offload_stage_output(interview_id, data)
+        save_stage_output(interview_id, stage, fields, unset)
+    report_stages(interview_id)
+
+def _run_audio_branch(video_path, interview_id, content_hash=None, interview_type=None, saved=None, media=None, *, metrics):
+    """🎙️ Audio -> timestamped transcript -> Q&A extraction & text analysis."""
+    if _stage_completed(saved, "transcription"):
+        # Resumed job: the transcript was persisted by an earlier attempt
+        transcript_segments = saved.get("transcript") or []
+    else:
+        def transcribe():
+            segments = get_cached(content_hash, "transcript", TRANSCRIPT_VERSION)
+            if segments is None:
+                segments = _transcribe(video_path, progress_callback(interview_id, "transcription"), media, metrics)
+                # Empty usually means Whisper failed; don't pin that in the cache
+                if segments:
+                    put_cached(content_hash, "transcript", TRANSCRIPT_VERSION, segments)
+            return segments
+
+        transcript_segments = _run_stage(interview_id, "transcription", transcribe)
+        # 🔥 Saved as interactive segments as soon as they exist
+        _save_stage(interview_id, "transcription", {"transcript": transcript_segments}, metrics)
+
+    if media is not None:
+        media.release("audio")  # Resumed, cached or decoded: the demux can drop the audio track
+
+    if _stage_completed(saved, "qa_analysis"):
+        qa_analysis = saved.get("analysis") or []
+    else:
+        # Lexicons differ per interview type (and per lexicon file edit), so they're part of the version
+        analyzer_version = scoring_version(interview_type)
+
+        def analyze():
+            qa_version = f"{TRANSCRIPT_VERSION}|{analyzer_version}"
+            result = get_cached(content_hash, "qa_analysis", qa_version)
+            if result is None:
+                result = _analyze_transcript(transcript_segments, interview_type, metrics)
+                if transcript_segments:
+                    put_cached(content_hash, "qa_analysis", qa_version, result)
+            return result
+
+        qa_analysis = _run_stage(interview_id, "qa_analysis", analyze)
+        # The version lets rescore.py find reports scored by older rules
+        _save_stage(interview_id, "qa_analysis", {
+            "analysis": qa_analysis,
+            # Small per-report counts so the dashboard listing never needs the transcript
+            "keyword_counts": count_keywords(" ".join(seg["text"] for seg in transcript_segments)),
+            "analyzer_version": analyzer_version
+        }, metrics)
+
+    return {
+        "transcript": transcript_segments,
+        "qa_analysis": qa_analysis
+    }
+
+def _run_vision_branch(video_path, interview_id, content_hash=None, interview_type=None, saved=None, media=None, *, metrics):
+    """🎭 Sampled frames -> FER -> emotion summary."""
+    if _stage_completed(saved, "emotions"):
+        if media is not None:
+            media.release("frames")
+        return {"emotion_analysis": saved.get("emotions") or {}}
+
+    def analyze():
+        raw = get_cached(content_hash, "raw_emotions", RAW_EMOTIONS_VERSION)
+        if raw is None:
+            # Frames are streamed straight from the decoder into FER (no temp JPEGs),
+            # sharded across EMOTION_WORKERS processes when configured
+            raw = analyze_video_emotions(video_path, progress=progress_callback(interview_id, "emotions"), media=media, metrics=metrics)
+            if raw:
+                put_cached(content_hash, "raw_emotions", RAW_EMOTIONS_VERSION, raw)
+        elif media is not None:
+            media.release("frames")
+        return raw
+
+    raw_emotions = _run_stage(interview_id, "emotions", analyze)
+    with metrics.stage("summarization"):
+        emotion_report = summarize_emotions(raw_emotions, fps=1)
+    # Raw per-second labels are kept so summaries can be recomputed without FER
+    _save_stage(interview_id, "emotions", {
+        "raw_emotions": raw_emotions,
+        "emotions": emotion_report,
+        "emotion_summary_version": EMOTION_SUMMARY_VERSION
+    }, metrics)
+    return {"emotion_analysis": emotion_report}
+
+# Stage graph: both branches depend only on the input file, so they run side by side
+# and the final report is the merge of their outputs.
+PIPELINE_BRANCHES = {
+    "audio": _run_audio_branch,
+    "vision": _run_vision_branch,
+}
+# Which stream of the shared demux each branch consumes
+BRANCH_MEDIA = {
+    "audio": "audio",
+    "vision": "frames",
+}
+
+def _run_branch(name, media, metrics, *args):
+    try:
+        return PIPELINE_BRANCHES[name](*args, media=media, metrics=metrics)
+    finally:
+        # Whatever happened, the demux must not wait on (or for) this branch
+        if media is not None:
+            media.release(BRANCH_MEDIA[name])
+
+def process_video(video_path, interview_id, content_hash=None, interview_type=None):
+    """
+    Runs (or resumes) the pipeline for one interview. Each stage persists its output
+    on the report as soon as it finishes; stages already completed by an earlier
+    attempt are skipped. Returns the merged report, or None if a branch failed.
+    """
+    media = None
+    # ⏱️ Time and peak memory per stage, stored on the report and aggregated for /metrics
+    metrics = PipelineMetrics(interview_id)
     try:
         if not os.path.exists(video_path):
             print(f"❌ Error: Video file not found at {video_path}")
             return None
 
-        # 1. ⏱️ Calculate Duration & Generate Thumbnail
-        cap = cv2.VideoCapture(video_path)
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        duration_seconds = frame_count / fps if fps > 0 else 0
-        duration_str = f"{int(duration_seconds // 60)}:{int(duration_seconds % 60):02d}"
-        
-        thumb_path = video_path.rsplit(".", 1)[0] + "_thumb.jpg"
-        ret, frame = cap.read()
-        if ret:
-            cv2.imwrite(thumb_path, frame)
-        cap.release()
+        saved = get_interview(interview_id, {"stages": 1, "transcript": 1, "analysis": 1, "emotions": 1, "payloads": 1})
+        if saved is None:
+            print(f"❌ Error: Interview {interview_id} no longer exists")
+            return None
+        if saved:
+            hydrate_reports([saved], fields=["transcript", "analysis", "emotion_percentages", "emotion_timeline", "stress_timeline"])
+
+        # 1. Shared ingest step: one demux of the file feeds every branch (when PyAV is installed)
+        with metrics.stage("ingest"):
+            media = open_media(video_path)
+            duration_str = _ingest_metadata(video_path, media)
 
         # Update initial metadata
-        update_interview_status(interview_id, "Transcribing...", duration=duration_str)
+        report_stage(interview_id, "Transcribing...", duration=duration_str)
 
-        # 2. 🎙️ Audio & Timestamped Transcript
-        audio_path = extract_audio_from_video(video_path)
-        # 🔥 Now returns a list of segments: [{"start": 0.0, "end": 2.0, "text": "..."}, ...]
-        transcript_segments = transcribe_audio(audio_path)
-        
-        # Create a full string version for Q&A extraction
-        full_transcript_text = " ".join([seg["text"] for seg in transcript_segments])
-        
-        update_interview_status(interview_id, "Analyzing Q&A...")
-
-        # 3. ✍️ Q&A Extraction & Text Analysis
-        qa_pairs = extract_qa_pairs(full_transcript_text)
-        qa_analysis = []
-        for qa in qa_pairs:
-            analysis = analyze_text(qa["answer"])
-            qa_analysis.append({
-                "question": qa["question"],
-                "answer": qa["answer"],
-                "analysis": analysis
-            })
-
-        update_interview_status(interview_id, "Analyzing Emotions...")
-
-        # 4. 🎭 Emotion Analysis
-        frames_folder = extract_frames_from_video(video_path)
-        raw_emotions = analyze_emotions_from_frames(frames_folder)
-        emotion_report = summarize_emotions(raw_emotions, fps=1)
+        # 2. 🔀 Run the audio/text and vision branches concurrently
+        report = {"duration": duration_str}
+        failed = []
+        with ThreadPoolExecutor(max_workers=len(PIPELINE_BRANCHES)) as pool:
+            futures = {
+                name: pool.submit(_run_branch, name, media, metrics, video_path, interview_id, content_hash, interview_type, saved)
+                for name in PIPELINE_BRANCHES
+            }
+            for name, future in futures.items():
+                try:
+                    report.update(future.result())
+                except Exception as e:
+                    print(f"🔥 {name.upper()} BRANCH CRASHED: {e}")
+                    failed.append(name)
 
-        # 5. 🚀 Final Output
-        return {
-            "duration": duration_str,
-            "transcript": transcript_segments, # 🔥 Saved as interactive segments
-            "qa_analysis": qa_analysis,
-            "emotion_analysis": emotion_report
-        }
+        if failed:
+            # Failed stages are in the stages map; the worker decides between a retry and giving up
+            return None
+
+        # 3. 🚀 Final Output
+        return report
 
     except Exception as e:
         print(f"🔥 PIPELINE CRASHED: {e}")
-        update_interview_status(interview_id, "Error in Analysis")
         return None
-    
     finally:
-        time.sleep(1) 
-        if audio_path and os.path.exists(audio_path):
-            try: os.remove(audio_path)
-            except: pass
-        if frames_folder and os.path.exists(frames_folder):
-            try: shutil.rmtree(frames_folder)
-            except: pass
\ No newline at end of file
+        if media is not None:
+            media.close()
+        metrics.flush()
@@ -0,0 +1,169 @@
+# 👷 Pipeline workers: run `python worker.py --workers 4` next to (or on other
+# machines than) the API. Each process claims jobs from the Mongo `jobs`
+# collection and keeps its lease alive with a heartbeat while the pipeline runs.
+import os
+import time
+import socket
+import argparse
+import threading
+import multiprocessing
+from multiprocessing.connection import wait
+from database import update_interview
+from progress_events import report_stage, report_finished, report_failed
+from job_queue import (
+    JOB_LEASE_SECONDS,
+    claim_job,
+    heartbeat_job,
+    complete_job,
+    fail_job,
+    reap_exhausted_jobs,
+    ensure_job_indexes
+)
+from metrics import record_job, record_model_loads
+from model_registry import model_stats
+
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "2"))
+WORKER_POLL_SECONDS = float(os.getenv("WORKER_POLL_SECONDS", "2"))
+# Longest wait between retries after the loop hits an error (e.g. Mongo unreachable)
+WORKER_MAX_BACKOFF_SECONDS = float(os.getenv("WORKER_MAX_BACKOFF_SECONDS", "60"))
+# Pause before the supervisor restarts a worker process that exited
+WORKER_RESTART_SECONDS = float(os.getenv("WORKER_RESTART_SECONDS", "5"))
+
+def run_pipeline(path, id, content_hash=None, interview_type=None):
+    """Runs the full analysis for one interview. Returns True when the report was saved."""
+    # Imported here so the supervisor process never loads the ML models
+    from video_processor import process_video
+
+    try:
+        report = process_video(path, id, content_hash, interview_type)
+        if report is None:
+            # process_video has already recorded which branch failed
+            return False
+        # Stage outputs were persisted as each stage finished; only the final state is left
+        update_interview(id, {
+            "duration": report["duration"],
+            "status": "Completed"
+        })
+        return True
+    except Exception as e:
+        # No "Error" status yet: the job may still be retried
+        print(f"Pipeline Error: {e}")
+        return False
+
+def _keep_lease_alive(job_id, worker_id, stop_event):
+    # Renew well before expiry so a slow Mongo round-trip doesn't lose the lease
+    while not stop_event.wait(JOB_LEASE_SECONDS / 3):
+        try:
+            if not heartbeat_job(job_id, worker_id):
+                print(f"⚠️ Lost lease on job {job_id}")
+                return
+        except Exception as e:
+            # Transient: the next tick retries well within the lease
+            print(f"⚠️ Heartbeat failed for job {job_id}: {e}")
+
+def _process_next_job(worker_id):
+    """Reaps, claims and runs one job. Returns False when there was nothing to do."""
+    for interview_id in reap_exhausted_jobs():
+        report_failed(interview_id)
+        record_job("failed")
+
+    job = claim_job(worker_id)
+    if not job:
+        return False
+
+    print(f"🛠️ {worker_id} picked up job {job['job_id']} (attempt {job['attempts']})")
+    stop_event = threading.Event()
+    heartbeat = threading.Thread(
+        target=_keep_lease_alive,
+        args=(job["job_id"], worker_id, stop_event),
+        daemon=True
+    )
+    heartbeat.start()
+
+    try:
+        ok = run_pipeline(job["video_path"], job["interview_id"], job.get("content_hash"), job.get("interview_type"))
+    finally:
+        stop_event.set()
+        heartbeat.join()
+    # Models not warmed up at startup are loaded lazily by the first job that needs them
+    record_model_loads(model_stats())
+
+    if ok:
+        if not complete_job(job["job_id"], worker_id):
+            # Lease lost (or job cancelled): the job's new owner does the reporting
+            print(f"⚠️ Job {job['job_id']} is no longer ours; not reporting it")
+            return True
+        report_finished(job["interview_id"], True, "Completed")
+        record_job("completed")
+    else:
+        status = fail_job(job["job_id"], worker_id, "Pipeline failed")
+        if status is None:
+            print(f"⚠️ Job {job['job_id']} is no longer ours; not reporting it")
+        elif status == "queued":
+            # Not an "Error..." status: clients keep following the interview through the retry
+            report_stage(job["interview_id"], "Retrying...")
+            record_job("retried")
+        else:
+            report_failed(job["interview_id"])
+            record_job("failed")
+    return True
+
+def worker_loop(worker_id):
+    print(f"👷 Worker {worker_id} started")
+    backoff = WORKER_POLL_SECONDS
+    while True:
+        try:
+            if not _process_next_job(worker_id):
+                time.sleep(WORKER_POLL_SECONDS)
+            backoff = WORKER_POLL_SECONDS
+        except Exception as e:
+            # A Mongo blip must not take the worker down; a job left mid-way is
+            # re-claimed once its lease expires
+            print(f"⚠️ {worker_id} loop error, retrying in {backoff:.0f}s: {e}")
+            time.sleep(backoff)
+            backoff = min(backoff * 2, WORKER_MAX_BACKOFF_SECONDS)
+
+def _worker_main(index):
+    worker_id = f"{socket.gethostname()}:{os.getpid()}:{index}"
+    try:
+        # Pay model load time once at startup rather than on the first job
+        from model_registry import warm_up
+        warm_up()
+        record_model_loads(model_stats())
+        worker_loop(worker_id)
+    except KeyboardInterrupt:
+        pass
+
+def main():
+    parser = argparse.ArgumentParser(description="Interview analysis pipeline workers")
+    parser.add_argument("--workers", type=int, default=WORKER_CONCURRENCY,
+                        help="number of worker processes on this machine")
+    args = parser.parse_args()
+
+    ensure_job_indexes()
+
+    # spawn: each worker loads its own copy of the models, nothing is fork-shared
+    ctx = multiprocessing.get_context("spawn")
+
+    def start(index):
+        process = ctx.Process(target=_worker_main, args=(index,))
+        process.start()
+        return process
+
+    processes = {i: start(i) for i in range(args.workers)}
+    try:
+        # Supervise: a worker that exits (crash, OOM kill, ...) is replaced so capacity never silently drops
+        while True:
+            wait([p.sentinel for p in processes.values()])
+            for index, process in list(processes.items()):
+                if process.exitcode is not None:
+                    print(f"⚠️ Worker {index} exited with code {process.exitcode}, restarting in {WORKER_RESTART_SECONDS:.0f}s")
+                    time.sleep(WORKER_RESTART_SECONDS)
+                    processes[index] = start(index)
+    except KeyboardInterrupt:
+        print("🛑 Stopping workers...")
+        for p in processes.values():
+            p.join()
+
+if __name__ == "__main__":
+    main()
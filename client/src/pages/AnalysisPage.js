@@ -32,10 +32,10 @@ export default function AnalysisPage() {
 
   useEffect(() => {
     if (!data && id) {
-      fetch(`${API_BASE}/interviews`)
+      fetch(`${API_BASE}/interview/${id}`)
         .then(res => res.json())
         .then(res => {
-          const interview = res.data.find(i => (i.interview_id === id || i._id === id));
+          const interview = res.data;
           if (interview) {
             setData(interview);
             setVideoUrl(`${API_BASE}/${interview.video_path}`);
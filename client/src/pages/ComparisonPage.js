@@ -21,8 +21,9 @@ const ComparisonPage = () => {
     const fetchComparisonData = async () => {
       try {
         const [res1, res2] = await Promise.all([
-          fetch(`${API_BASE}/interview/${id1}`),
-          fetch(`${API_BASE}/interview/${id2}`)
+          // Only the headline scores are compared, so skip the bulky payloads
+          fetch(`${API_BASE}/interview/${id1}?view=summary`),
+          fetch(`${API_BASE}/interview/${id2}?view=summary`)
         ]);
         const data1 = await res1.json();
         const data2 = await res2.json();
@@ -1,4 +1,4 @@
-import { useEffect, useState, useCallback } from "react";
+import { useEffect, useState, useCallback, useRef } from "react";
 import { useNavigate, Link, useLocation } from "react-router-dom";
 import { 
   PlayCircle, Calendar, ChevronRight, Loader2, 
@@ -14,30 +14,62 @@ import { jsPDF } from 'jspdf';
 import autoTable from 'jspdf-autotable'; 
 
 const API_BASE = "http://127.0.0.1:8000";
+const PAGE_SIZE = 24;
+
+// Same order as the server's listing: pinned first, then newest
+const sortForListing = (items) => [...items].sort((a, b) => (
+  (b.is_pinned ? 1 : 0) - (a.is_pinned ? 1 : 0) || new Date(b.created_at) - new Date(a.created_at)
+));
 
 export default function Dashboard() {
   const [data, setData] = useState([]);
   const [loading, setLoading] = useState(true);
-  const [isProcessing, setIsProcessing] = useState(false);
   const [editingId, setEditingId] = useState(null);
   const [newTitle, setNewTitle] = useState("");
   const [searchTerm, setSearchTerm] = useState("");
   const [selectedIds, setSelectedIds] = useState([]); 
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   
   const navigate = useNavigate();
   const location = useLocation();
 
-  const fetchInterviews = useCallback(async () => {
+  // One summary page at a time: transcripts and full analyses stay on the server until a report is opened
+  const fetchInterviews = useCallback(async (cursor = null) => {
     try {
-      const res = await fetch(`${API_BASE}/interviews`);
+      const params = new URLSearchParams({ view: "summary", limit: String(PAGE_SIZE) });
+      if (cursor) params.set("cursor", cursor);
+      const res = await fetch(`${API_BASE}/interviews?${params}`);
       const result = await res.json();
-      return result.data || [];
+      return { items: result.data || [], next: result.next_cursor || null };
     } catch (err) { 
       console.error("Fetch error:", err);
-      return []; 
+      return { items: [], next: null }; 
     }
   }, []);
 
+  const loadMore = async () => {
+    if (!nextCursor || loadingMore) return;
+    setLoadingMore(true);
+    const { items, next } = await fetchInterviews(nextCursor);
+    setData(prev => {
+      const seen = new Set(prev.map(item => item.interview_id));
+      return prev.concat(items.filter(item => !seen.has(item.interview_id)));
+    });
+    setNextCursor(next);
+    setLoadingMore(false);
+  };
+
+  // Card-level refresh for one interview, instead of re-reading the whole list
+  const refreshInterview = useCallback(async (id) => {
+    try {
+      const res = await fetch(`${API_BASE}/interview/${id}?view=summary`);
+      if (!res.ok) return;
+      const { data: fresh } = await res.json();
+      setData(prev => prev.map(item => (item.interview_id === id ? { ...item, ...fresh } : item)));
+    } catch (err) { console.error("Refresh error:", err); }
+  }, []);
+
   const sortedData = [...data].sort((a, b) => new Date(a.created_at) - new Date(b.created_at));
   
   const trendData = sortedData.slice(-10).map((item, index) => ({
@@ -62,19 +94,16 @@ export default function Dashboard() {
 
   const techKeywords = ["react", "node", "python", "mongodb", "api", "database", "java", "oops"];
 
-  // 🔥 FIXED: Keyword Counts logic to handle Array and String transcript formats
+  // Reports analyzed before keyword_counts existed only carry their first Q&A in the summary view
+  const partialKeywordReports = data.filter(item => !item.keyword_counts && item.analysis?.length).length;
+
   const keywordCounts = techKeywords.map(word => {
     const count = data.reduce((acc, item) => {
+      // Counted server-side when the report is analyzed
+      if (item.keyword_counts) return acc + (item.keyword_counts[word] || 0);
       const regex = new RegExp(`\\b${word}\\b`, 'gi');
-      
-      // If transcript is new Array format, join text segments first
-      let fullText = "";
-      if (Array.isArray(item.transcript)) {
-        fullText = item.transcript.map(seg => seg.text).join(" ");
-      } else if (typeof item.transcript === "string") {
-        fullText = item.transcript;
-      }
-
+      const first = item.analysis?.[0] || {};
+      const fullText = `${first.question || ""} ${first.answer || ""}`;
       return acc + (fullText.match(regex)?.length || 0);
     }, 0);
     return { name: word.toUpperCase(), count };
@@ -151,8 +180,7 @@ export default function Dashboard() {
     if (!window.confirm(`Delete ${selectedIds.length} interviews?`)) return;
     setLoading(true);
     await Promise.all(selectedIds.map(id => fetch(`${API_BASE}/interview/${id}`, { method: "DELETE" })));
-    const updated = await fetchInterviews();
-    setData(updated);
+    setData(prev => prev.filter(item => !selectedIds.includes(item.interview_id)));
     setSelectedIds([]);
     setLoading(false);
   };
@@ -173,8 +201,9 @@ export default function Dashboard() {
         body: JSON.stringify({ is_pinned: !currentStatus }),
       });
       if (response.ok) {
-        const updatedData = await fetchInterviews();
-        setData(updatedData);
+        setData(prev => sortForListing(prev.map(item => (
+          item.interview_id === id ? { ...item, is_pinned: !currentStatus } : item
+        ))));
       }
     } catch (err) { console.error("Pinning failed", err); }
   };
@@ -187,30 +216,71 @@ export default function Dashboard() {
       body: JSON.stringify({ title: newTitle }),
     });
     setEditingId(null);
-    const updatedData = await fetchInterviews();
-    setData(updatedData);
+    setData(prev => prev.map(item => (item.interview_id === id ? { ...item, title: newTitle } : item)));
   };
 
   useEffect(() => {
-    if (location.state?.processing) setIsProcessing(true);
-    fetchInterviews().then((itvs) => { 
-      setData(itvs); 
+    fetchInterviews().then(({ items, next }) => { 
+      setData(items); 
+      setNextCursor(next);
       setLoading(false); 
     });
-    let interval;
-    if (location.state?.processing || isProcessing) {
-        interval = setInterval(async () => {
-            const latest = await fetchInterviews();
-            setData(latest);
-            const processingItems = latest.filter(item => item.status && item.status !== "Completed");
-            if (processingItems.length === 0 && !location.state?.processing) {
-                setIsProcessing(false);
-                clearInterval(interval);
-            }
-        }, 3000);
-    }
-    return () => clearInterval(interval);
-  }, [location.state, fetchInterviews, isProcessing]);
+  }, [location.state, fetchInterviews]);
+
+  // 📡 Live progress: one SSE stream per interview still processing (no more polling /interviews)
+  const processingIds = data
+    .filter(item => item.status && item.status !== "Completed" && !item.status.startsWith("Error"))
+    .map(item => item.interview_id)
+    .join(",");
+
+  // One stream per id, kept open across list changes so a backlog is never replayed
+  const streamsRef = useRef(new Map());
+
+  useEffect(() => {
+    const streams = streamsRef.current;
+    const ids = new Set(processingIds ? processingIds.split(",") : []);
+    const patchItem = (id, patch) => setData(prev => prev.map(item => (
+      item.interview_id === id ? { ...item, ...patch(item) } : item
+    )));
+
+    // Drop streams for interviews that were deleted or are no longer processing
+    streams.forEach((source, id) => {
+      if (!ids.has(id)) {
+        source.close();
+        streams.delete(id);
+      }
+    });
+
+    ids.forEach((id) => {
+      if (streams.has(id)) return;
+      const source = new EventSource(`${API_BASE}/interview/${id}/events`);
+      source.addEventListener("stage", (e) => {
+        const { status } = JSON.parse(e.data);
+        if (status) patchItem(id, () => ({ status }));
+      });
+      source.addEventListener("progress", (e) => {
+        const { stage, percent } = JSON.parse(e.data);
+        if (percent != null) patchItem(id, (item) => ({ progress: { ...item.progress, [stage]: percent } }));
+      });
+      const finish = async () => {
+        // Only completed/failed end the stream; retries keep streaming under "Retrying..."
+        source.close();
+        streams.delete(id);
+        await refreshInterview(id);
+      };
+      source.addEventListener("completed", finish);
+      source.addEventListener("failed", finish);
+      streams.set(id, source);
+    });
+  }, [processingIds, refreshInterview]);
+
+  useEffect(() => {
+    const streams = streamsRef.current;
+    return () => {
+      streams.forEach(source => source.close());
+      streams.clear();
+    };
+  }, []);
 
   if (loading) return (
     <div className="min-h-screen flex flex-col items-center justify-center bg-gray-50">
@@ -268,6 +338,11 @@ export default function Dashboard() {
                 </BarChart>
               </ResponsiveContainer>
             </div>
+            {partialKeywordReports > 0 && (
+              <p className="text-[11px] text-slate-400 mt-3">
+                {partialKeywordReports} older report{partialKeywordReports === 1 ? "" : "s"} counted from the first answer only.
+              </p>
+            )}
           </div>
         </div>
 
@@ -292,6 +367,11 @@ export default function Dashboard() {
                 <div className="absolute inset-0 bg-white/95 backdrop-blur-sm z-[70] flex flex-col items-center justify-center p-8 text-center">
                   <Loader2 className="animate-spin text-blue-600 mb-4" size={32} />
                   <p className="font-black text-slate-800 text-lg">{item.status}</p>
+                  {item.progress && (
+                    <p className="text-sm text-slate-500 mt-2">
+                      {Object.entries(item.progress).map(([stage, percent]) => `${stage} ${Math.round(percent)}%`).join(" · ")}
+                    </p>
+                  )}
                 </div>
               )}
               <div className="absolute top-3 left-3 z-[60] flex gap-2">
@@ -333,12 +413,20 @@ export default function Dashboard() {
                   <Sparkles size={14} className="text-purple-500 mt-1 shrink-0" />
                   <p className="text-[11px] text-slate-500 leading-relaxed line-clamp-2 italic">{item.analysis?.[0]?.analysis?.suggestions?.[0] || "Review the full report for targeted AI feedback."}</p>
                 </div>
-                <button onClick={() => navigate(`/analysis/${item.interview_id}`, { state: { analysis: item, videoUrl: `${API_BASE}/${item.video_path}` } })} className="w-full flex items-center justify-center gap-2 bg-slate-900 text-white py-3.5 rounded-2xl hover:bg-blue-600 transition-all font-bold shadow-sm">View Full Report <ChevronRight size={18} /></button>
+                <button onClick={() => navigate(`/analysis/${item.interview_id}`, { state: { videoUrl: `${API_BASE}/${item.video_path}` } })} className="w-full flex items-center justify-center gap-2 bg-slate-900 text-white py-3.5 rounded-2xl hover:bg-blue-600 transition-all font-bold shadow-sm">View Full Report <ChevronRight size={18} /></button>
               </div>
             </div>
           ))}
         </div>
 
+        {nextCursor && (
+          <div className="flex justify-center mt-10">
+            <button onClick={loadMore} disabled={loadingMore} className="flex items-center gap-2 bg-white border border-gray-200 text-slate-700 px-8 py-3 rounded-full font-bold shadow-sm hover:border-blue-500 hover:text-blue-600 transition disabled:opacity-60">
+              {loadingMore && <Loader2 className="animate-spin" size={16} />} Load more interviews
+            </button>
+          </div>
+        )}
+
         {/* --- DYNAMIC FLOATING TOOLBAR --- */}
         {selectedIds.length > 0 && (
           <div className="fixed bottom-10 left-1/2 -translate-x-1/2 bg-slate-900 text-white px-8 py-5 rounded-[2.5rem] shadow-2xl z-[100] flex items-center gap-8 border border-white/10 animate-in fade-in slide-in-from-bottom-5">